@@ -0,0 +1,169 @@
+from array import array
+from datetime import date as Date, datetime, timedelta
+from math import isnan, nan
+from statistics import median
+from typing import List, Tuple
+
+from errors import BadRequestError
+
+# Reduces a statistic's per-player rows (aligned with a list of dates, NaN for "no value") to a bounded
+# number of points, so that the size of the response - and the time the chart takes to draw it - doesn't
+# grow with the length of the requested range. Controlled by `get_data`'s query parameters:
+#
+# * `resolution` - `day` (i.e. no bucketing), `week`, `month` or `year`: each bucket is labelled with
+#   its first date, and holds the `aggregate` of each player's values within it
+# * `aggregate` - `mean` (default), `median`, or `best` (the lowest value - i.e. the fastest time)
+# * `max_points` - an upper bound on the number of dates returned (DEFAULT_MAX_POINTS if not given). With
+#   `downsample=bucket` (the default), picks the finest resolution that fits, no finer than `resolution` -
+#   and if even yearly buckets don't fit, merges runs of adjacent years. With `downsample=lttb`, keeps the
+#   `max_points` most visually significant dates instead (Largest-Triangle-Three-Buckets), chosen from
+#   the mean of the players' values on each date - every player keeps their own value on those dates.
+
+DATE_FORMAT = '%Y-%m-%d'
+# A year of daily points - which is also what the chart asks for
+DEFAULT_MAX_POINTS = 366
+RESOLUTIONS = ['day', 'week', 'month', 'year']
+AGGREGATES = {
+    'mean': lambda values: sum(values) / len(values),
+    'median': median,
+    'best': min
+}
+
+
+def downsample(dates: List[str], rows: List[array], params: dict,
+               as_int: bool) -> Tuple[List[str], List[array], bool, str]:
+    # Returns the new dates and rows, whether the values are still all integers, and how the dates
+    # were chosen - `lttb`, or the bucket size (`day` if left alone, `week`, `month`, `year`, or e.g.
+    # `3years-2015` for buckets of three years from 2015). Only the same bucket size from one call to the
+    # next gives the same labels for the same dates - see `get_data`'s cursor.
+    resolution = params.get('resolution')
+    aggregate = params.get('aggregate', 'mean')
+    max_points = _max_points(params)
+    method = params.get('downsample', 'bucket')
+
+    if resolution is not None and resolution not in RESOLUTIONS:
+        raise BadRequestError(f'Unknown resolution "{resolution}" - expected one of {", ".join(RESOLUTIONS)}')
+    if aggregate not in AGGREGATES:
+        raise BadRequestError(f'Unknown aggregate "{aggregate}" - expected one of {", ".join(AGGREGATES)}')
+    if method not in ('bucket', 'lttb'):
+        raise BadRequestError(f'Unknown downsample method "{method}" - expected "bucket" or "lttb"')
+
+    if method == 'lttb':
+        if len(dates) <= max_points:
+            return dates, rows, as_int, 'day'
+        if max_points < 3:
+            raise BadRequestError('max_points must be at least 3 for lttb')
+        return _lttb(dates, rows, max_points) + (as_int, 'lttb')
+
+    candidates = RESOLUTIONS[RESOLUTIONS.index(resolution or 'day'):]
+    resolution = next((candidate for candidate in candidates
+                       if len({_bucket(date, candidate) for date in dates}) <= max_points), None)
+    if resolution == 'day':
+        return dates, rows, as_int, resolution
+    if resolution is None:
+        first_year, years_per_bucket = _multi_year_buckets(dates, max_points)
+        resolution = f'{years_per_bucket}years-{first_year}'
+        bucket = lambda date: Date(first_year + (int(date[:4]) - first_year) // years_per_bucket * years_per_bucket,
+                                   1, 1).strftime(DATE_FORMAT)
+    else:
+        bucket = lambda date: _bucket(date, resolution)
+    return _bucket_rows(dates, rows, bucket, AGGREGATES[aggregate]) + (as_int and aggregate == 'best', resolution)
+
+
+def _max_points(params: dict):
+    value = params.get('max_points')
+    if value is None:
+        return DEFAULT_MAX_POINTS
+    try:
+        parsed = int(value)
+    except ValueError:
+        raise BadRequestError(f'Parameter "max_points" must be an integer, got "{value}"')
+    if parsed < 1:
+        raise BadRequestError(f'Parameter "max_points" must be at least 1, got {parsed}')
+    return parsed
+
+
+def _bucket(date_string: str, resolution: str) -> str:
+    if resolution == 'day':
+        return date_string
+    date = datetime.strptime(date_string, DATE_FORMAT).date()
+    if resolution == 'week':
+        # Weeks start on Monday
+        return (date - timedelta(days=date.weekday())).strftime(DATE_FORMAT)
+    if resolution == 'month':
+        return Date(date.year, date.month, 1).strftime(DATE_FORMAT)
+    return Date(date.year, 1, 1).strftime(DATE_FORMAT)
+
+
+def _multi_year_buckets(dates, max_points):
+    # For when even one bucket per year is too many: buckets of as many years as it takes to fit,
+    # counted from the first date's year. Returns that year, and the years per bucket.
+    first_year = int(dates[0][:4])
+    return first_year, -(-(int(dates[-1][:4]) - first_year + 1) // max_points)
+
+
+def _bucket_rows(dates, rows, bucket_of, aggregate):
+    # `dates` are sorted, so each bucket is a contiguous run of columns. `bucket_of` maps a date to
+    # its bucket's label.
+    bucket_dates = []
+    bucket_bounds = []
+    for column, date in enumerate(dates):
+        bucket = bucket_of(date)
+        if not bucket_dates or bucket_dates[-1] != bucket:
+            bucket_dates.append(bucket)
+            bucket_bounds.append([column, column + 1])
+        else:
+            bucket_bounds[-1][1] = column + 1
+
+    bucketed_rows = []
+    for row in rows:
+        bucketed = array('d', [nan]) * len(bucket_dates)
+        for i, (start, end) in enumerate(bucket_bounds):
+            values = [value for value in row[start:end] if not isnan(value)]
+            if values:
+                bucketed[i] = aggregate(values)
+        bucketed_rows.append(bucketed)
+    return bucket_dates, bucketed_rows
+
+
+def _lttb(dates, rows, threshold):
+    # Selecting from each player's series separately could keep up to `threshold` dates per player, so
+    # the dates are selected once, from a combined series - the mean of whoever has a value on each
+    ordinals = [datetime.strptime(date, DATE_FORMAT).toordinal() for date in dates]
+    combined = []
+    for column, ordinal in enumerate(ordinals):
+        values = [row[column] for row in rows if not isnan(row[column])]
+        if values:
+            combined.append((ordinal, sum(values) / len(values), column))
+    kept_columns = sorted(_lttb_select(combined, threshold))
+    return [dates[column] for column in kept_columns], \
+        [array('d', [row[column] for column in kept_columns]) for row in rows]
+
+
+def _lttb_select(points, threshold):
+    # `points` are (x, y, column) - returns the set of columns to keep
+    if len(points) <= threshold:
+        return {column for _, _, column in points}
+
+    selected = {points[0][2]}
+    bucket_size = (len(points) - 2) / (threshold - 2)
+    previous = points[0]
+    for i in range(threshold - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        # The average of the next bucket stands in for the (not yet chosen) next point
+        next_start, next_end = end, min(int((i + 2) * bucket_size) + 1, len(points))
+        next_points = points[next_start:next_end] or [points[-1]]
+        average_x = sum(x for x, _, _ in next_points) / len(next_points)
+        average_y = sum(y for _, y, _ in next_points) / len(next_points)
+
+        best, best_area = None, -1.0
+        for point in points[start:end]:
+            area = abs((previous[0] - average_x) * (point[1] - previous[1]) -
+                       (previous[0] - point[0]) * (average_y - previous[1]))
+            if area > best_area:
+                best, best_area = point, area
+        selected.add(best[2])
+        previous = best
+    selected.add(points[-1][2])
+    return selected
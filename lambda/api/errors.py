@@ -0,0 +1,6 @@
+# Exceptions raised from API methods. The external Lambda sees the class name as the `errorType` of
+# a failed invocation, and maps it to an HTTP status code - so keep these names stable.
+
+
+class BadRequestError(Exception):
+    pass
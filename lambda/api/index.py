@@ -1,13 +1,25 @@
-import boto3
+import startup_profile
+# Must happen before any other imports, so that they're included in the profile (if enabled)
+startup_profile.start()
+
+import metrics
+
+import bisect
 import hashlib
-import requests
+import json
+import os
+import random
+import threading
 
 from datetime import datetime, time, timedelta, timezone
-
-from bs4 import BeautifulSoup
-from typing import Iterable
+from time import monotonic, sleep
+from typing import Iterator
 from urllib import parse
 
+# Heavier dependencies (boto3, requests, and this package's own parsing and statistics modules) are
+# imported inside the functions that need them, rather than here - so that each method only pays,
+# at cold start, for what it actually uses. See `scripts/benchmark-cold-start.py`.
+
 import logging
 # https://stackoverflow.com/questions/37703609
 LOG = logging.getLogger(__name__)
@@ -18,13 +30,83 @@ FOUR_DAYS = timedelta(days=4)
 DATE_FORMAT = '%Y-%m-%d'
 
 SECRET_ID = 'nyt-cookie'
+# Each group is a separate leaderboard, polled with the cookie held in its own secret. Configured as
+# a JSON object of group name -> secret id in `groupSecrets`; without it, there's a single group
+# using `SECRET_ID`. The default group's data is stored under plain keys (as it was before groups
+# existed), and every other group's under keys prefixed with `<group>#` - see `_namespaced`.
+DEFAULT_GROUP = 'default'
+GROUP_SECRETS = json.loads(os.environ.get('groupSecrets') or '{}') or {DEFAULT_GROUP: SECRET_ID}
+LEADERBOARD_URL = os.environ.get('leaderboardUrl', 'https://www.nytimes.com/puzzles/leaderboards')
+# Used by `backfill_scores` to fetch a past day's leaderboard. `{date}` is replaced with `YYYY-MM-DD`.
+LEADERBOARD_HISTORY_URL = os.environ.get('leaderboardHistoryUrl', LEADERBOARD_URL + '?date={date}')
+# Must match the `indexName` in `crossword_stats-stack.ts`
+SCORE_TABLE_DATE_INDEX = 'date-index'
+
+STACK_NAME = 'CrosswordStatsStack'
+# How long a resolved table name is trusted before we go back to CloudFormation for it.
+# Table names only change if the table is replaced, so this can afford to be long.
+TABLE_NAME_TTL_SECONDS = 15 * 60
+
+# Module-level, so that they survive across warm invocations of the same container.
+# boto3 clients and resources are comparatively expensive to create (each one loads
+# service models and opens its own connection pool), so we only ever make one of each.
+BOTO_CONFIG_OPTIONS = {'max_pool_connections': 25}
+_clients = {}
+_resources = {}
+# export_name -> (table_name, monotonic time at which it was resolved)
+_table_names = {}
+# group -> validators (ETag, Last-Modified and a hash of the body) from the last leaderboard response
+# this container successfully stored for it, so that unchanged leaderboards can be skipped without parsing.
+_last_leaderboard_responses = {}
+# secret id -> {'hash', 'cookies', 'fetched_at', 'written_at'}: the cookie secret's text (as a hash), parsed,
+# and when it was last read from and written to Secrets Manager by this container. See `_get_cookies`.
+_cookie_cache = {}
+# Cookies rarely change, so a poll can use them for a while before re-reading the secret. Rotating
+# them from another container (e.g. `update_cookie` served by the external Lambda) is noticed within
+# this long - or straight away, if polling with the old ones fails.
+COOKIE_TTL_SECONDS = 15 * 60
+# The userscript sends the cookie on every page view. After storing a new one, further changes within
+# this long are dropped rather than written (the next page view after it will send them again).
+COOKIE_WRITE_INTERVAL_SECONDS = 60
+# `requests.Session`s (and so their connection pools) are reused across calls, but aren't
+# guaranteed thread-safe - so each thread gets its own.
+_http = threading.local()
+
+DEFAULT_BACKFILL_WORKERS = 8
+# Upper bound on a backfill's `max_workers` - beyond this, it's just hammering the leaderboard
+MAX_BACKFILL_WORKERS = 16
+# Upper bound on how many groups' leaderboards `update_scores` fetches at once
+MAX_POLL_WORKERS = 8
+# Stop starting new fetches when the invocation has less than this long left, so that a backfill
+# that's too big for one invocation stops cleanly (and can be resumed) rather than timing out. The
+# function's timeout (see `static-website-with-api.ts`) has to be comfortably longer than this.
+BACKFILL_SAFETY_MARGIN_MILLIS = 15 * 1000
+MAX_WRITE_ATTEMPTS = 8
+# A month is "closed" (and so can be archived - see `archive_scores`) once its last day is at least
+# this far in the past. The leaderboard's day lags UTC, so the first polls of a month can still be
+# writing the previous month's last day.
+ARCHIVE_GRACE_PERIOD = timedelta(days=2)
+# The longest `date_range` that `get_data` will serve - it's a public endpoint, and every month of a
+# range costs at least one read (and, the first time, possibly a query per day - see `_get_daily_rollups`)
+MAX_DATE_RANGE_DAYS = 10 * 366
 
 
 def handler(event, context):
+    # Maintenance operations are dispatched on the event's `operation`, which - unlike its `path` - a
+    # request through API Gateway (and so through the external Lambda) has no way to set. They can only
+    # be started by the schedule, or by an operator invoking this Lambda directly.
+    operation = event.get('operation')
+    if operation in operations:
+        with startup_profile.invocation(operation), \
+                metrics.invocation(function='api', method=operation):
+            return operations[operation](event, context)
+
     path = event["path"]
     first_path_segment = path.split('/')[1]
     if first_path_segment in methods:
-        return methods[first_path_segment](event, context)
+        with startup_profile.invocation(first_path_segment), \
+                metrics.invocation(function='api', method=first_path_segment):
+            return methods[first_path_segment](event, context)
 
     return f'Hello! You have hit the path {event["path"]}!'
 
@@ -43,88 +125,268 @@ def get_data(event, context):
     # TODO - better default-case handling!
     if date_range_string == '_':
         date_range_string = f'{(datetime.now()-FOUR_DAYS).strftime(DATE_FORMAT)}_{datetime.now().strftime(DATE_FORMAT)}'
-    date_range = date_range_string.split('_')
+    date_range = _parse_date_range(date_range_string)
 
-    score_table = _get_score_table()
-    data = score_table.scan(
-        ExpressionAttributeNames={
-            '#d': 'date'
-        },
-        ExpressionAttributeValues={
-            ':val1': date_range[0],
-            ':val2': date_range[1]
-        },
-        FilterExpression='#d between :val1 and :val2',
-    )
+    group = _parse_group(params.get('group'))
+    with metrics.span('get_data.fetch'):
+        rollups = _get_daily_rollups(date_range[0], date_range[1], group)
 
     statistic = params.get('statistic', 'standard')
+    since, since_resolution = _parse_cursor(params.get('since'))
+
+    with metrics.span('get_data.reformat'):
+        response, resolution = _reformat_score_data(statistic, rollups, params)
+
+    # The cursor is the latest write time of any rollup in the range, and how the dates were
+    # downsampled. Passing it back as `since` gets a response that only covers dates from the earliest
+    # one that has been written since - unless the dates were chosen by LTTB (where any change can
+    # move every point), or are now bucketed differently, in which case it's a full response.
+    updated_at = max([since or 0] + [rollup.get('updated_at', 0) for rollup in rollups.values()])
+    response['cursor'] = f'{updated_at}.{resolution}'
+    if since is not None and resolution == since_resolution and resolution != 'lttb':
+        _restrict_to_changes_since(response, rollups, since)
+    return response
+
+
+def get_summary(event, context):
+    # Per-player aggregates (mean, median and best time, games played, wins and current streak) over
+    # a calendar period - e.g. "this month" is just `/api/get_summary`. `window` is one of `week`,
+    # `month` (the default), `year` or `all`, and `date` picks the period containing it (default
+    # today). These are maintained as scores are stored - see `score_summary.py`.
+    from score_summary import from_item, new_summary, parse_window, period_key, summarise
+    params = event.get('queryStringParameters') or {}
+    window = parse_window(params.get('window'))
+    group = _parse_group(params.get('group'))
+    date = params.get('date') or datetime.now(timezone.utc).strftime(DATE_FORMAT)
+    try:
+        key = period_key(date, window)
+    except ValueError:
+        from errors import BadRequestError
+        raise BadRequestError(f'Invalid date "{date}" - expected YYYY-MM-DD')
 
-    return _reformat_score_data(statistic, data)
+    item = _get_summary_table().get_item(Key={'period': _namespaced(group, key)}).get('Item')
+    return {
+        'period': key,
+        'players': summarise(from_item(item) if item else new_summary())
+    }
 
 
 def update_cookie(event, context):
     cookie_text = event['body']
-    secrets = boto3.client('secretsmanager')
-    current_secret = secrets.get_secret_value(
-        SecretId=SECRET_ID
-    ).get('SecretString', '')
-    if current_secret == cookie_text:
+    secret_id = GROUP_SECRETS[_parse_group((event.get('queryStringParameters') or {}).get('group'))]
+    cookie_hash = _hash_cookie(cookie_text)
+    cached = _cookie_cache.get(secret_id)
+    if cached is not None and cached['hash'] == cookie_hash and \
+            monotonic() - cached['fetched_at'] < COOKIE_TTL_SECONDS:
+        # No change (as far as this container knows) - do nothing, without asking Secrets Manager
+        metrics.count('update_cookie.cache_hits')
+        return False
+    if cached is not None and cached['written_at'] is not None and \
+            monotonic() - cached['written_at'] < COOKIE_WRITE_INTERVAL_SECONDS:
+        metrics.count('update_cookie.rate_limited')
+        return False
+
+    if _load_cookie_secret(secret_id)['hash'] == cookie_hash:
         # No change - do nothing
         return False
 
-    secrets.put_secret_value(
-        SecretId=SECRET_ID,
+    _get_client('secretsmanager').put_secret_value(
+        SecretId=secret_id,
         SecretString=cookie_text
     )
+    _cache_cookie_secret(secret_id, cookie_text, written_at=monotonic())
     return True
 
 
 def update_scores(event, context):
+    # Polls every group's leaderboard. Fetching and parsing happen concurrently (on a bounded pool),
+    # so adding groups doesn't stretch the invocation out linearly - and a group that fails is
+    # logged and reported without holding up, or failing, the others.
 
     now = datetime.now(timezone.utc)
     shouldEmailNotification = event.get('emailNotification', '').lower() is 'true'
 
-    try:
-        secrets = boto3.client('secretsmanager')
-        cookies_secret = secrets.get_secret_value(
-            SecretId=SECRET_ID).get('SecretString', '')
-        cookies = dict([(i.split('=')[0], parse.unquote(i.split('=')[1]))
-                        for i in cookies_secret.split('; ')])
-        r = requests.get('https://www.nytimes.com/puzzles/leaderboards', cookies=cookies)
-        soup = BeautifulSoup(r.text, features="html.parser")
-        score_divs = [div for div in
-                      soup.find_all('div', {'class': 'lbd-score'})
-                      if 'no-rank' not in div['class']]
-        scores = [{
-            'name': _get_name(div),
-            'time': _get_time(div)
-        } for div in score_divs]
-        date = _get_date(soup)
-
-        score_table = _get_score_table()
-
-        with score_table.batch_writer() as batch:
-            for score in scores:
-                batch.put_item(Item={
-                    'id': _build_id(date, score),
-                    'date': date,
-                    'name': score['name'],
-                    'time': score['time']
-                })
-                print(f'DEBUG - putting data to Dynamo: {date}:{score}')
-        # TODO - check scores for own username, and send reminder if not received by given time
-        return True
-    except Exception as e:
+    updated, unchanged, failed = [], [], []
+
+    def record_failure(group, e):
         LOG.exception(e)
+        failed.append(group)
+        # Perhaps the cookie has expired, or been replaced by another container - either way, the
+        # next poll should re-read it
+        _cookie_cache.pop(GROUP_SECRETS[group], None)
+
+    # Cookies are resolved here, on the calling thread - Secrets Manager clients and the cookie
+    # cache aren't shared with the pool, which only fetches and parses
+    cookies = {}
+    for group, secret_id in GROUP_SECRETS.items():
+        try:
+            cookies[group] = _get_cookies(secret_id)
+        except Exception as e:
+            record_failure(group, e)
+
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    with ThreadPoolExecutor(max_workers=max(1, min(MAX_POLL_WORKERS, len(cookies)))) as executor:
+        futures = {executor.submit(_poll_leaderboard, group, group_cookies): group
+                   for group, group_cookies in cookies.items()}
+        # As in `backfill_scores`, writes happen here on the calling thread (boto3 resources aren't
+        # thread-safe), as each group's fetch completes
+        for future in as_completed(futures):
+            group = futures[future]
+            try:
+                polled = future.result()
+                if polled is None:
+                    # Nothing has changed since the last poll, so there's nothing to parse or write
+                    metrics.count('update_scores.unchanged')
+                    unchanged.append(group)
+                    continue
+                r, date, scores = polled
+                with metrics.span('update_scores.store'):
+                    _store_scores(date, scores, group)
+                # Only remember the response once it's safely stored - otherwise a failed write would
+                # never be retried, since every subsequent poll would look unchanged
+                _remember_leaderboard_response(r, group)
+                # TODO - check scores for own username, and send reminder if not received by given time
+                updated.append(group)
+            except Exception as e:
+                record_failure(group, e)
+
+    if failed:
+        metrics.count('update_scores.failed', len(failed))
         # TODO - customizable time threshold
         # TODO - consider boundary issues
         date_string = now.strftime(DATE_FORMAT)
-        if now.time() > time(17, 0, 0, 0, timezone.utc) and \
+        if now.timetz() > time(17, 0, 0, 0, timezone.utc) and \
                 shouldEmailNotification and \
                 not _have_reported_failure_for_date(date_string):
             # TODO - actually send email
-            LOG.info(f'Reported failure: {e}')
+            LOG.info(f'Reported failure for groups: {", ".join(sorted(failed))}')
             _record_reported_failure(date_string)
+    return {
+        'updated': sorted(updated),
+        'unchanged': sorted(unchanged),
+        'failed': sorted(failed)
+    }
+
+
+def backfill_scores(event, context):
+    # Loads past leaderboards for an (inclusive) date range, e.g.:
+    #   {"operation": "backfill_scores", "queryStringParameters": {"date_range": "2021-01-01_2021-02-01"}}
+    #
+    # Dates that have already been stored (i.e. have a rollup with a fingerprint) are skipped, so
+    # an interrupted backfill is resumed by simply re-running it with the same range.
+    params = event.get('queryStringParameters') or {}
+    start_date, end_date = params['date_range'].split('_')
+    max_workers = max(1, min(int(params.get('max_workers', DEFAULT_BACKFILL_WORKERS)), MAX_BACKFILL_WORKERS))
+    group = _parse_group(params.get('group'))
+
+    dates = list(_dates_between(start_date, end_date))
+    already_stored = {date for date, rollup in _batch_get_rollups(dates, group).items()
+                      if 'fingerprint' in rollup}
+    pending = [date for date in dates if date not in already_stored]
+    cookies = _get_cookies(GROUP_SECRETS[group])
+
+    out_of_time = object()
+
+    def fetch(date):
+        # Every date is queued up-front, so the time left is checked as a worker picks each one up
+        if context is not None and \
+                context.get_remaining_time_in_millis() < BACKFILL_SAFETY_MARGIN_MILLIS:
+            return out_of_time
+        return _fetch_historical_scores(date, cookies)
+
+    stored, failed, not_attempted = [], [], []
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(fetch, date): date for date in pending}
+        # Fetching and parsing happens on the pool, but writes happen here on the calling thread
+        # (boto3 resources aren't thread-safe), as each date's fetch completes.
+        for future in as_completed(futures):
+            date = futures[future]
+            try:
+                scores = future.result()
+                if scores is out_of_time:
+                    not_attempted.append(date)
+                    continue
+                if scores is None:
+                    continue
+                _store_scores(date, scores, group)
+                stored.append(date)
+            except Exception as e:
+                LOG.exception(e)
+                failed.append(date)
+
+    metrics.count('backfill.stored', len(stored))
+    metrics.count('backfill.failed', len(failed))
+    # Storing into a closed month drops its archive (see `_store_scores`), so rebuild those now
+    # rather than leaving reads on the slow path until the next scheduled `archive_scores`
+    from score_archive import month_of
+    _archive_months(sorted(month for month in {month_of(date) for date in stored} if _is_closed_month(month)),
+                    group)
+    return {
+        'stored': sorted(stored),
+        'skipped': sorted(already_stored),
+        'failed': sorted(failed),
+        'not_attempted': sorted(not_attempted)
+    }
+
+
+def archive_scores(event, context):
+    # Compacts closed months into a single columnar item each (see `score_archive.py`), which
+    # `get_data` then reads in place of the month's daily rollups, e.g.:
+    #   {"operation": "archive_scores", "queryStringParameters": {"date_range": "2021-01-01_2021-06-30"}}
+    #
+    # Without a `date_range`, archives the most recent closed month - and without a `group`, does so
+    # for every group. Months that are already archived are skipped, unless `force` is `true`.
+    from score_archive import month_of
+    params = event.get('queryStringParameters') or {}
+    if 'date_range' in params:
+        start_date, end_date = params['date_range'].split('_')
+    else:
+        cutoff = datetime.now(timezone.utc).date() - ARCHIVE_GRACE_PERIOD
+        start_date = end_date = (cutoff.replace(day=1) - timedelta(days=1)).strftime(DATE_FORMAT)
+    months = sorted(month for month in {month_of(date) for date in _dates_between(start_date, end_date)}
+                    if _is_closed_month(month))
+
+    groups = [_parse_group(params['group'])] if 'group' in params else list(GROUP_SECRETS)
+
+    archived, skipped = [], []
+    for group in groups:
+        already_archived = set()
+        if params.get('force', '').lower() != 'true':
+            already_archived = set(_batch_get_items(
+                'archiveTableName', 'month', [_namespaced(group, month) for month in months]))
+        pending = [month for month in months if _namespaced(group, month) not in already_archived]
+        _archive_months(pending, group)
+        archived.extend(_namespaced(group, month) for month in pending)
+        skipped.extend(already_archived)
+    metrics.count('archive.months', len(archived))
+    return {
+        'archived': archived,
+        'skipped': sorted(skipped)
+    }
+
+
+def rebuild_summaries(event, context):
+    # Recomputes the summaries behind `get_summary` from scratch, by replaying the stored scores for
+    # a date range in order. An operation (see `handler`), e.g.:
+    #   {"operation": "rebuild_summaries", "queryStringParameters": {"date_range": "2021-01-01_2021-12-31"}}
+    #
+    # For history from before summaries existed, or after a backfill (whose out-of-order writes can
+    # leave streaks short). Every period the range touches is replaced with what's inside the range,
+    # so the range should cover the whole history.
+    from score_summary import apply_scores, new_summary, period_keys
+    params = event.get('queryStringParameters') or {}
+    start_date, end_date = params['date_range'].split('_')
+    group = _parse_group(params.get('group'))
+
+    rollups = _get_daily_rollups(start_date, end_date, group)
+    summaries = {}
+    for date in sorted(rollups):
+        for key in period_keys(date):
+            summary = summaries.setdefault(key, dict(new_summary(), period=_namespaced(group, key)))
+            apply_scores(summary, date, {}, rollups[date]['players'])
+    _write_items_with_backoff(_resolve_table_name('summaryTableName'), list(summaries.values()))
+    return {'rebuilt': sorted(summaries)}
 
 
 def _record_reported_failure(date_string: str):
@@ -147,135 +409,517 @@ def _get_email_information_for_date(date_string: str):
 
 
 def _get_email_notification_date_info():
-    return boto3.client('dynamo')
+    return _get_client('dynamodb')
+
+
+def _build_id(date, score, group: str = DEFAULT_GROUP):
+    return hashlib.md5(f'{_namespaced(group, date)}_{score["name"]}'.encode('utf-8')).hexdigest()
+
+
+def _namespaced(group: str, key: str) -> str:
+    # Keys for the default group are left as they are, so that data stored before groups existed
+    # still belongs to it
+    return key if group == DEFAULT_GROUP else f'{group}#{key}'
+
+
+def _parse_group(group):
+    if not group:
+        return DEFAULT_GROUP
+    if group not in GROUP_SECRETS:
+        from errors import BadRequestError
+        raise BadRequestError(f'Unknown group "{group}" - expected one of {", ".join(GROUP_SECRETS)}')
+    return group
+
+
+def _get_cookies(secret_id: str = SECRET_ID):
+    # Returns the secret's cookies as a dict, re-reading the secret at most every COOKIE_TTL_SECONDS
+    cached = _cookie_cache.get(secret_id)
+    if cached is None or monotonic() - cached['fetched_at'] >= COOKIE_TTL_SECONDS:
+        cached = _load_cookie_secret(secret_id)
+    else:
+        metrics.count('cookies.cache_hits')
+    return cached['cookies']
+
+
+def _load_cookie_secret(secret_id: str):
+    secrets = _get_client('secretsmanager')
+    cookies_secret = secrets.get_secret_value(
+        SecretId=secret_id).get('SecretString', '')
+    previous = _cookie_cache.get(secret_id) or {}
+    return _cache_cookie_secret(secret_id, cookies_secret, written_at=previous.get('written_at'))
+
+
+def _cache_cookie_secret(secret_id: str, cookies_secret: str, written_at=None):
+    cached = _cookie_cache[secret_id] = {
+        'hash': _hash_cookie(cookies_secret),
+        'cookies': _parse_cookies(cookies_secret),
+        'fetched_at': monotonic(),
+        'written_at': written_at
+    }
+    return cached
+
+
+def _hash_cookie(cookie_text: str) -> str:
+    return hashlib.sha256(cookie_text.encode('utf-8')).hexdigest()
+
+
+def _parse_cookies(cookies_secret: str):
+    # Expected format: `name1=value1; name2=value2`, with URL-encoded values
+    cookies = {}
+    for pair in cookies_secret.split('; '):
+        if pair:
+            name, _, value = pair.partition('=')
+            cookies[name] = parse.unquote(value)
+    return cookies
+
+
+def _get_http_session():
+    if not hasattr(_http, 'session'):
+        # Imported here rather than at the top of the file, because only the scraping methods need
+        # it - and this module is also loaded in-process by the external Lambda to serve `get_data`
+        import requests
+        _http.session = requests.Session()
+    return _http.session
+
+
+def _fetch_historical_scores(date: str, cookies):
+    r = _get_http_session().get(LEADERBOARD_HISTORY_URL.format(date=date), cookies=cookies)
+    r.raise_for_status()
+    from leaderboard_parser import parse_leaderboard
+    leaderboard_date, scores = parse_leaderboard(r.text)
+    if leaderboard_date != date:
+        # Most likely, the server ignored the requested date and sent today's leaderboard instead
+        LOG.warning(f'Asked for the leaderboard for {date}, but got {leaderboard_date} - skipping')
+        return None
+    return scores
+
+
+def _poll_leaderboard(group: str, cookies: dict):
+    # Returns the group's leaderboard response, date and scores - or `None` if it's unchanged
+    with metrics.span('update_scores.fetch'):
+        r = _fetch_leaderboard(cookies, group)
+    if r is None:
+        return None
+    with metrics.span('update_scores.parse'):
+        from leaderboard_parser import parse_leaderboard
+        date, scores = parse_leaderboard(r.text)
+    return r, date, scores
+
+
+def _fetch_leaderboard(cookies, group: str = DEFAULT_GROUP):
+    # Returns `None` if the leaderboard is known to be unchanged since the last stored poll
+    last_response = _last_leaderboard_responses.get(group, {})
+    headers = {}
+    if last_response.get('etag'):
+        headers['If-None-Match'] = last_response['etag']
+    if last_response.get('last_modified'):
+        headers['If-Modified-Since'] = last_response['last_modified']
+    r = _get_http_session().get(LEADERBOARD_URL, cookies=cookies, headers=headers)
+    if r.status_code == 304:
+        return None
+    r.raise_for_status()
+    # Not every server honours conditional requests, so also compare the body itself
+    if last_response.get('body_hash') == hashlib.sha256(r.content).hexdigest():
+        return None
+    return r
+
+
+def _remember_leaderboard_response(r, group: str = DEFAULT_GROUP):
+    _last_leaderboard_responses[group] = {
+        'etag': r.headers.get('ETag'),
+        'last_modified': r.headers.get('Last-Modified'),
+        'body_hash': hashlib.sha256(r.content).hexdigest()
+    }
+
+
+def _store_scores(date: str, scores, group: str = DEFAULT_GROUP):
+    # Writes only the scores that are new or changed since the last poll. The rollup for the date
+    # already holds every player's current time, plus a fingerprint of the whole leaderboard that
+    # produced it - so an unchanged leaderboard costs one read and no writes.
+    rollup = _get_rollup(date, group)
+    fingerprint = _fingerprint_scores(scores)
+    if rollup.get('fingerprint') == fingerprint:
+        metrics.count('scores_unchanged')
+        return
+
+    changed_scores = [score for score in scores
+                      if rollup['players'].get(score['name']) != score['time']]
+    _write_items_with_backoff(_resolve_table_name('scoreTableName'), [{
+        'id': _build_id(date, score, group),
+        'date': date,
+        'name': score['name'],
+        'time': score['time'],
+        'group': group
+    } for score in changed_scores])
+    metrics.count('scores_written', len(changed_scores))
+    players = dict(rollup['players'], **{score['name']: score['time'] for score in changed_scores})
+    with metrics.span('update_summaries'):
+        summaries = _update_summaries(date, rollup['players'], players, group)
+    rollup_item = _update_daily_rollup(rollup, changed_scores, fingerprint, group)
+    # The rollup's fingerprint is what marks the leaderboard as handled, and applying a change to the
+    # summaries twice would count it twice - so they're written together, or not at all (in which
+    # case the next poll sees the change again, and applies it once)
+    _put_items_atomically([('rollupTableName', rollup_item)] +
+                          [('summaryTableName', summary) for summary in summaries])
+    # A late score for an already-archived month makes its archive stale - drop it, so that reads
+    # fall back to the (up-to-date) rollups until the month is re-archived
+    from score_archive import month_of
+    if _is_closed_month(month_of(date)):
+        _get_archive_table().delete_item(Key={'month': _namespaced(group, month_of(date))})
+
+
+def _update_summaries(date: str, previous_players, players, group: str = DEFAULT_GROUP):
+    # Applies a date's change of scores to every summary (week, month, year, all-time) it falls in,
+    # and returns them to be written
+    from score_summary import apply_scores, from_item, new_summary, period_keys
+    keys = [_namespaced(group, key) for key in period_keys(date)]
+    existing = _batch_get_items('summaryTableName', 'period', keys)
+    summaries = []
+    for key in keys:
+        summary = from_item(existing[key]) if key in existing else dict(new_summary(), period=key)
+        apply_scores(summary, date, previous_players, players)
+        summaries.append(summary)
+    return summaries
+
+
+def _put_items_atomically(items):
+    # `items` is a list of (table export name, item) - at most 100 of them, and 4MB in total
+    _get_resource('dynamodb').meta.client.transact_write_items(TransactItems=[
+        {'Put': {'TableName': _resolve_table_name(export_name), 'Item': item}} for export_name, item in items])
+
+
+def _write_items_with_backoff(table_name: str, items):
+    # Like `Table.batch_writer`, except that items Dynamo hands back as unprocessed (usually because
+    # of throttling) are retried with exponential backoff, rather than immediately re-sent.
+    dynamodb = _get_resource('dynamodb')
+    # BatchWriteItem accepts at most 25 items per call
+    for i in range(0, len(items), 25):
+        request_items = {table_name: [{'PutRequest': {'Item': item}} for item in items[i:i+25]]}
+        for attempt in range(MAX_WRITE_ATTEMPTS):
+            request_items = dynamodb.batch_write_item(RequestItems=request_items).get('UnprocessedItems')
+            if not request_items:
+                break
+            sleep(random.uniform(0, 0.05 * 2 ** attempt))
+        else:
+            raise RuntimeError(f'Gave up writing {len(request_items[table_name])} items to {table_name}')
+
+
+def _fingerprint_scores(scores) -> str:
+    # Order-independent, so that a reshuffled-but-identical leaderboard counts as unchanged
+    canonical = ';'.join(sorted(f'{score["name"]}={score["time"]}' for score in scores))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def _get_rollup(date: str, group: str = DEFAULT_GROUP):
+    existing = _get_rollup_table().get_item(Key={'date': _namespaced(group, date)}).get('Item')
+    return _normalise_rollup(existing) if existing else _build_rollup(date, {})
+
+
+def _update_daily_rollup(rollup, scores, fingerprint: str, group: str = DEFAULT_GROUP):
+    # Keeps the per-date aggregates up-to-date as scores arrive, so that reads never have to
+    # re-aggregate the raw rows. `scores` should only contain new or changed scores. Returns the
+    # item to write.
+    for score in scores:
+        name, new_time = score['name'], score['time']
+        old_time = rollup['players'].get(name)
+        if old_time is None:
+            rollup['count'] += 1
+        else:
+            rollup['sum'] -= old_time
+            del rollup['times'][bisect.bisect_left(rollup['times'], old_time)]
+        rollup['sum'] += new_time
+        bisect.insort(rollup['times'], new_time)
+        rollup['players'][name] = new_time
+
+    if rollup['times']:
+        rollup['min'] = rollup['times'][0]
+        rollup['max'] = rollup['times'][-1]
+    rollup['fingerprint'] = fingerprint
+    rollup['updated_at'] = int(datetime.now(timezone.utc).timestamp() * 1000)
+    return dict(rollup, date=_namespaced(group, rollup['date']))
+
+
+def _build_rollup(date: str, players):
+    times = sorted(players.values())
+    return {
+        'date': date,
+        'players': dict(players),
+        'count': len(times),
+        'sum': sum(times),
+        'min': times[0] if times else None,
+        'max': times[-1] if times else None,
+        'times': times
+    }
+
+
+def _normalise_rollup(item):
+    # Dynamo hands numbers back as `Decimal`s. The key may be namespaced by group - strip that off.
+    rollup = _build_rollup(item['date'].rpartition('#')[2], {name: int(t) for name, t in item['players'].items()})
+    if 'fingerprint' in item:
+        rollup['fingerprint'] = item['fingerprint']
+    if 'updated_at' in item:
+        rollup['updated_at'] = int(item['updated_at'])
+    return rollup
+
+
+def _get_daily_rollups(start_date: str, end_date: str, group: str = DEFAULT_GROUP):
+    # Returns {date: rollup} for every date in the range that has any scores. Closed months come from
+    # their archive item, and everything else from the live rollups.
+    #
+    # A closed month that hasn't been archived yet is archived here. Most dates without scores never
+    # get a rollup (days before the group existed, or that nobody played), and would otherwise fall
+    # back to querying the raw scores on every request - archiving the month records that they're empty.
+    from score_archive import month_of
+    dates = list(_dates_between(start_date, end_date))
+    metrics.count('get_data.dates', len(dates))
+    closed_months = sorted(month for month in {month_of(date) for date in dates} if _is_closed_month(month))
+    with metrics.span('get_data.fetch_archives'):
+        rollups, archived_months = _get_archived_rollups(closed_months, group)
+    metrics.count('get_data.archived_months', len(archived_months))
+    unarchived_months = [month for month in closed_months if month not in archived_months]
+    if unarchived_months:
+        metrics.count('get_data.unarchived_months', len(unarchived_months))
+        with metrics.span('get_data.archive_months'):
+            rollups.update(_archive_months(unarchived_months, group))
+    live_dates = [date for date in dates if month_of(date) not in closed_months]
+    rollups = {date: rollup for date, rollup in rollups.items() if start_date <= date <= end_date}
+    rollups.update(_get_live_rollups(live_dates, group))
+    return rollups
+
+
+def _get_archived_rollups(months, group: str = DEFAULT_GROUP):
+    # Returns {date: rollup} for every date with scores in the archived months, and the set of
+    # months that were archived
+    from score_archive import unpack_month
+    rollups = {}
+    archived_months = set()
+    archives = _batch_get_items('archiveTableName', 'month', [_namespaced(group, month) for month in months])
+    for key, archive in archives.items():
+        month = key.rpartition('#')[2]
+        archived_months.add(month)
+        for date, unpacked in unpack_month(dict(archive, month=month)).items():
+            rollups[date] = _build_rollup(date, unpacked['players'])
+            rollups[date]['updated_at'] = unpacked['updated_at']
+    return rollups, archived_months
+
+
+def _get_live_rollups(dates, group: str = DEFAULT_GROUP):
+    rollups = _batch_get_rollups(dates, group)
+    # Dates scored before rollups existed (or whose rollup write failed) are rebuilt from the raw
+    # rows. This is the slow path, so it's worth backfilling the rollups if it gets hit a lot. The
+    # leaderboard's day lags UTC, so there's nothing to find for dates after today's.
+    today = datetime.now(timezone.utc).strftime(DATE_FORMAT)
+    missing_dates = [date for date in dates if date not in rollups and date <= today]
+    metrics.count('get_data.rollup_misses', len(missing_dates))
+    with metrics.span('get_data.query_raw_scores'):
+        missing_scores = _query_scores_for_dates(missing_dates, group)
+    for date, players in missing_scores.items():
+        rollups[date] = _build_rollup(date, players)
+    return rollups
+
+
+def _batch_get_rollups(dates, group: str = DEFAULT_GROUP):
+    items = _batch_get_items('rollupTableName', 'date', [_namespaced(group, date) for date in dates])
+    return {rollup['date']: rollup for rollup in map(_normalise_rollup, items.values())}
+
+
+def _batch_get_items(export_name: str, key_name: str, keys):
+    # Returns {key: item} for the keys that exist, from a table with a single (string) key
+    dynamodb = _get_resource('dynamodb')
+    table_name = _resolve_table_name(export_name)
+    items = {}
+    # BatchGetItem accepts at most 100 keys per call
+    for i in range(0, len(keys), 100):
+        request_items = {table_name: {'Keys': [{key_name: key} for key in keys[i:i+100]]}}
+        while request_items:
+            response = dynamodb.batch_get_item(RequestItems=request_items)
+            for item in response['Responses'].get(table_name, []):
+                items[item[key_name]] = item
+            request_items = response.get('UnprocessedKeys')
+    return items
+
+
+def _archive_months(months, group: str = DEFAULT_GROUP):
+    # Returns {date: rollup} for the dates with scores in the archived months - as they would be read
+    # back from the archives (see `_get_archived_rollups`)
+    from score_archive import dates_in_month, pack_month
+    archive_table = _get_archive_table()
+    archived = {}
+    for month in months:
+        rollups = _get_live_rollups(dates_in_month(month), group)
+        archive = pack_month(month, rollups)
+        archive['month'] = _namespaced(group, month)
+        archive_table.put_item(Item=archive)
+        for date, rollup in rollups.items():
+            archived[date] = _build_rollup(date, rollup['players'])
+            archived[date]['updated_at'] = rollup.get('updated_at', 0)
+    return archived
+
+
+def _is_closed_month(month: str) -> bool:
+    from score_archive import dates_in_month
+    cutoff = (datetime.now(timezone.utc).date() - ARCHIVE_GRACE_PERIOD).strftime(DATE_FORMAT)
+    return dates_in_month(month)[-1] < cutoff
+
+
+def _query_scores_for_dates(dates, group: str = DEFAULT_GROUP):
+    # One (paginated) query per day against the date index, so that the cost of a request
+    # scales with the size of the range rather than with the size of the whole table.
+    # Returns {date: {name: time}}, omitting dates with no scores.
+    from boto3.dynamodb.conditions import Key
+    score_table = _get_score_table()
+    scores = {}
+    for date in dates:
+        query_kwargs = {
+            'IndexName': SCORE_TABLE_DATE_INDEX,
+            'KeyConditionExpression': Key('date').eq(date)
+        }
+        while True:
+            response = score_table.query(**query_kwargs)
+            for item in response['Items']:
+                # Rows stored before groups existed have no `group`, and belong to the default one
+                if item.get('group', DEFAULT_GROUP) == group:
+                    scores.setdefault(date, {})[item['name']] = int(item['time'])
+            if 'LastEvaluatedKey' not in response:
+                break
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    return scores
+
+
+def _parse_date_range(date_range_string: str):
+    # `YYYY-MM-DD_YYYY-MM-DD`, inclusive at both ends - returns the two dates as strings
+    from errors import BadRequestError
+    date_range = date_range_string.split('_')
+    try:
+        if len(date_range) != 2:
+            raise ValueError
+        start, end = (datetime.strptime(date, DATE_FORMAT) for date in date_range)
+    except ValueError:
+        raise BadRequestError(f'Invalid date_range "{date_range_string}" - expected YYYY-MM-DD_YYYY-MM-DD')
+    if start > end:
+        raise BadRequestError(f'Invalid date_range "{date_range_string}" - it ends before it starts')
+    if (end - start).days >= MAX_DATE_RANGE_DAYS:
+        raise BadRequestError(f'Invalid date_range "{date_range_string}" - it can cover at most {MAX_DATE_RANGE_DAYS} days')
+    return start.strftime(DATE_FORMAT), end.strftime(DATE_FORMAT)
+
+
+def _dates_between(start_date: str, end_date: str) -> Iterator[str]:
+    # Inclusive at both ends, to match the previous `between` filter
+    date = datetime.strptime(start_date, DATE_FORMAT)
+    end = datetime.strptime(end_date, DATE_FORMAT)
+    while date <= end:
+        yield date.strftime(DATE_FORMAT)
+        date += timedelta(days=1)
+
+
+def _reformat_score_data(statistic, rollups, params):
+    from downsampling import downsample
+    from score_matrix import ScoreMatrix
+    from score_statistics import compute_statistic_rows
+    matrix = ScoreMatrix.from_rollups(rollups)
+    rows, as_int = compute_statistic_rows(statistic, matrix, params)
+    dates, rows, as_int, resolution = downsample(matrix.dates, rows, params, as_int)
+    return matrix.to_response(rows, as_int=as_int, dates=dates), resolution
+
+
+def _parse_cursor(cursor):
+    # Returns the cursor's write time and resolution (see `get_data`). A cursor from before the
+    # resolution was included has none, and so never matches.
+    if cursor is None or cursor == '':
+        return None, None
+    updated_at, _, resolution = cursor.partition('.')
+    try:
+        return int(updated_at), resolution or None
+    except ValueError:
+        from errors import BadRequestError
+        raise BadRequestError(f'Invalid cursor "{cursor}" - pass back the `cursor` from a previous response')
+
+
+def _restrict_to_changes_since(response, rollups, since: int):
+    # Every statistic depends only on the current and earlier dates, so a change on one date can
+    # affect that date and any after it - never before. (When dates have been bucketed, the
+    # bucket containing the earliest change is the first that can differ - i.e. the last whose
+    # label is no later than that date.) That only holds if the dates are bucketed just as they were
+    # for the cursor, and weren't chosen by LTTB - `get_data` checks both.
+    response['delta'] = True
+    changed_dates = [date for date, rollup in rollups.items() if rollup.get('updated_at', 0) > since]
+    if not changed_dates:
+        first_column = len(response['dates'])
+    else:
+        earliest_change = min(changed_dates)
+        first_column = max([0] + [i for i, date in enumerate(response['dates']) if date <= earliest_change])
+    response['dates'] = response['dates'][first_column:]
+    response['scores'] = {name: scores[first_column:] for name, scores in response['scores'].items()
+                          if any(score is not None for score in scores[first_column:])}
 
 
-def _build_id(date, score):
-    return hashlib.md5(f'{date}_{score["name"]}'.encode('utf-8')).hexdigest()
+def _get_email_table():
+    return _get_table_by_export_name('emailTableName')
 
 
-def _get_name(div):
-    return div.find_all('p', {'class': 'lbd-score__name'})[0].text.replace('(you)', '').strip()
+def _get_score_table():
+    return _get_table_by_export_name('scoreTableName')
 
 
-def _get_time(div):
-    split = div.find_all('p', {'class': 'lbd-score__time'})[0].text.split(':')
-    return 60*int(split[0]) + int(split[1])
+def _get_rollup_table():
+    return _get_table_by_export_name('rollupTableName')
 
 
-def _get_date(soup):
-    date_string = soup.find_all('h3', {'class': 'lbd-type__date'})[0].text
-    split = date_string.split(' ')
-    year = split[3]
-    # +1 because the Gregorian Calendar's months are not 0-indexed
-    month = str(['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December'].index(split[1])+1).rjust(2, '0')
-    day = str(split[2][0: -1]).rjust(2, '0')
-    return '-'.join([year, month, day])
+def _get_archive_table():
+    return _get_table_by_export_name('archiveTableName')
 
 
-def _reformat_score_data(statistic, data_from_dynamo):
-    if statistic == 'standard':
-        return _reformat_score_data_standard(data_from_dynamo)
-    if statistic == 'deviation_from_average':
-        return _reformat_score_data_deviation(data_from_dynamo)
+def _get_summary_table():
+    return _get_table_by_export_name('summaryTableName')
 
 
-def _reformat_score_data_standard(data_from_dynamo):
-    # This could _probably_ be done in a single pass,
-    # but what the heck, this isn't exactly a performance-intensive
-    # high-TPS Lambda, nor is it a whiteboarding interview :P
-    #
-    # (Plus, from what I can see, DynamoDB scans cannot return items
-    # in sorted order, which would probably be a prerequisite to do this
-    # in some pleasingly-Big-O way)
-    dates = []
-    intermediate_score_lookup = {}
-    for item in data_from_dynamo['Items']:
-        if item['name'] not in intermediate_score_lookup:
-            intermediate_score_lookup[item['name']] = {}
-        if item['date'] not in dates:
-            dates.append(item['date'])
-        intermediate_score_lookup[item['name']][item['date']] = int(item['time'])
-
-    dates.sort()
-    return_data = {'dates':dates, 'scores':{}}
-    # For each person, construct an array of scores, in order matching the dates
-    # (with `None` representing missing scores)
-    for name in intermediate_score_lookup:
-        personal_scores = []
-        for date in dates:
-            if date in intermediate_score_lookup[name]:
-                personal_scores.append(intermediate_score_lookup[name][date])
-            else:
-                personal_scores.append(None)
-        return_data['scores'][name] = personal_scores
-
-    return return_data
-
-
-def _reformat_score_data_deviation(data_from_dynamo):
-    # See above for my defence against the hideous inefficiency of this :P
-    running_averages = {}
-    intermediate_score_lookup = {}
-    for item in data_from_dynamo['Items']:
-        if item['name'] not in intermediate_score_lookup:
-            intermediate_score_lookup[item['name']] = {}
-        if item['date'] not in running_averages:
-            running_averages[item['date']] = []
-        time = int(item['time'])
-        intermediate_score_lookup[item['name']][item['date']] = time
-        running_averages[item['date']].append(time)
-
-    dates = list(running_averages.keys()).copy()
-    dates.sort()
-
-    def average(iterable: Iterable[int]):
-        sum = 0
-        count = 0
-        for i in iterable:
-            sum += i
-            count += 1
-        return sum // count
-
-    averages = {k: average(v) for k, v in running_averages.items()}
-    return_data = {'dates': dates, 'scores': {}}
-
-    for name in intermediate_score_lookup:
-        personal_scores = []
-        for date in dates:
-            average_for_date = averages[date]
-            if date in intermediate_score_lookup[name]:
-                # Note - this is _not_ the proper mathematical definition of "variance".
-                personal_scores.append(
-                    (intermediate_score_lookup[name][date] - average_for_date) / average_for_date)
-            else:
-                personal_scores.append(None)
-        return_data['scores'][name] = personal_scores
-
-    return return_data
+def _get_table_by_export_name(export_name: str):
+    return _get_resource('dynamodb').Table(_resolve_table_name(export_name))
 
 
-def _get_email_table():
-    return _get_table_by_export_name('emailTableName')
+def _resolve_table_name(export_name: str) -> str:
+    # An environment variable named after the export always wins - this is how the stack passes
+    # table names in, and makes it easy to point a local run at a different table.
+    if os.environ.get(export_name):
+        return os.environ[export_name]
 
+    cached = _table_names.get(export_name)
+    if cached and monotonic() - cached[1] < TABLE_NAME_TTL_SECONDS:
+        return cached[0]
 
-def _get_score_table():
-    return _get_table_by_export_name('scoreTableName')
+    with metrics.span('resolve_table_name'):
+        table_name = _lookup_stack_output(export_name)
+    _table_names[export_name] = (table_name, monotonic())
+    return table_name
 
 
-def _get_table_by_export_name(export_name: str):
-    cloudformation = boto3.resource('cloudformation')
+def _lookup_stack_output(export_name: str) -> str:
+    cloudformation = _get_resource('cloudformation')
     # TODO - are the docs at https://bit.ly/36TOxv4 wrong? They claim `.filter` has Return Type
     # `list(cloudformation.Stack)`, but trying to do `.filter(...)[0]` gives
     # `TypeError: 'cloudformation.stacksCollection' object is not subscriptable`
     #
     # GitHub issue here, I think: https://github.com/boto/boto3/issues/1903
-    stack = next(iter(cloudformation.stacks.filter(StackName='CrosswordStatsStack')))
-    table_name = [output['OutputValue']
-                  for output in stack.outputs
-                  if output.get('ExportName', export_name) == ''][0]
+    stack = next(iter(cloudformation.stacks.filter(StackName=os.environ.get('stackId', STACK_NAME))))
+    return [output['OutputValue']
+            for output in stack.outputs
+            if output.get('ExportName') == export_name][0]
+
 
-    return boto3.resource('dynamodb').Table(table_name)
+def _get_client(service_name: str):
+    if service_name not in _clients:
+        import boto3
+        from botocore.config import Config
+        _clients[service_name] = boto3.client(service_name, config=Config(**BOTO_CONFIG_OPTIONS))
+    return _clients[service_name]
+
+
+def _get_resource(service_name: str):
+    if service_name not in _resources:
+        import boto3
+        from botocore.config import Config
+        _resources[service_name] = boto3.resource(service_name, config=Config(**BOTO_CONFIG_OPTIONS))
+    return _resources[service_name]
 
 # I could probably do this by mapping explicit mappings/integrations in CDK to separate Functions.
 # However, https://docs.aws.amazon.com/apigateway/latest/developerguide/set-up-lambda-proxy-integrations.html
@@ -285,5 +929,15 @@ def _get_table_by_export_name(export_name: str):
 methods = {
     'update_cookie': update_cookie,
     'update_scores': update_scores,
-    'get_data': get_data
+    'get_data': get_data,
+    'get_summary': get_summary
 }
+
+# Not reachable through `/api/` - see `handler`
+operations = {
+    'archive_scores': archive_scores,
+    'backfill_scores': backfill_scores,
+    'rebuild_summaries': rebuild_summaries
+}
+
+startup_profile.finish_init()
@@ -0,0 +1,117 @@
+from html.parser import HTMLParser
+from typing import List, Tuple
+
+# Pulls the date and scores out of the leaderboard page, without building a document tree.
+#
+# The page is mostly scripts, styles and markup that we don't care about, and building a full
+# BeautifulSoup tree of all of it was the bulk of the cost of each poll. Instead, this listens to the
+# parser's tag events and only collects text while inside the handful of elements we need:
+#
+#   <h3 class="lbd-type__date">Saturday, February 13, 2021</h3>
+#   <div class="lbd-score">                       (skipped if it also has the class `no-rank`)
+#       <p class="lbd-score__name">Alice</p>
+#       <p class="lbd-score__time">0:34</p>
+#   </div>
+
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September',
+          'October', 'November', 'December']
+
+
+class LeaderboardParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.date_string = None
+        self.scores = []
+        # Depth of nested `<div>`s inside the current score div (0 when not inside one)
+        self._score_div_depth = 0
+        self._current_score = None
+        # Which field (if any) text is currently being collected for, and the tag that closes it
+        self._field = None
+        self._field_tag = None
+        self._text = []
+
+    def handle_starttag(self, tag, attrs):
+        if self._score_div_depth:
+            if tag == 'div':
+                self._score_div_depth += 1
+            elif tag == 'p' and self._field is None:
+                classes = _classes(attrs)
+                if 'lbd-score__name' in classes:
+                    self._start_field('name', tag)
+                elif 'lbd-score__time' in classes:
+                    self._start_field('time', tag)
+            return
+
+        if tag == 'div':
+            classes = _classes(attrs)
+            if 'lbd-score' in classes and 'no-rank' not in classes:
+                self._score_div_depth = 1
+                self._current_score = {}
+        elif tag == 'h3' and self.date_string is None and 'lbd-type__date' in _classes(attrs):
+            self._start_field('date', tag)
+
+    def handle_endtag(self, tag):
+        if self._field is not None and tag == self._field_tag:
+            self._end_field()
+        if self._score_div_depth and tag == 'div':
+            self._score_div_depth -= 1
+            if not self._score_div_depth:
+                self.scores.append(self._current_score)
+                self._current_score = None
+
+    def handle_data(self, data):
+        if self._field is not None:
+            self._text.append(data)
+
+    def _start_field(self, field, tag):
+        self._field = field
+        self._field_tag = tag
+        self._text = []
+
+    def _end_field(self):
+        text = ''.join(self._text)
+        if self._field == 'date':
+            self.date_string = text
+        else:
+            self._current_score[self._field] = text
+        self._field = None
+        self._field_tag = None
+
+
+def parse_leaderboard(html: str) -> Tuple[str, List[dict]]:
+    # Returns the leaderboard's date (as `YYYY-MM-DD`), and a list of `{'name': ..., 'time': seconds}`
+    parser = LeaderboardParser()
+    parser.feed(html)
+    parser.close()
+    if parser.date_string is None:
+        raise ValueError('Could not find the leaderboard date - has the page layout changed?')
+    return _parse_date(parser.date_string), [{
+        'name': _parse_name(score['name']),
+        'time': _parse_time(score['time'])
+    } for score in parser.scores]
+
+
+def _classes(attrs) -> List[str]:
+    for name, value in attrs:
+        if name == 'class':
+            return (value or '').split()
+    return []
+
+
+def _parse_name(text: str) -> str:
+    return text.replace('(you)', '').strip()
+
+
+def _parse_time(text: str) -> int:
+    split = text.split(':')
+    return 60*int(split[0]) + int(split[1])
+
+
+def _parse_date(date_string: str) -> str:
+    # Expected format: `Saturday, February 13, 2021`
+    split = date_string.split(' ')
+    year = split[3]
+    # +1 because the Gregorian Calendar's months are not 0-indexed
+    month = str(MONTHS.index(split[1])+1).rjust(2, '0')
+    day = str(split[2][0: -1]).rjust(2, '0')
+    return '-'.join([year, month, day])
@@ -0,0 +1,82 @@
+import sys
+from array import array
+from calendar import monthrange
+from typing import Dict, List
+
+# Packs a closed month's scores into one columnar item, so that reading a month of history is a
+# single fetch of a few packed blobs rather than one item (and one parse) per score:
+#
+#   month       'YYYY-MM' (the partition key)
+#   players     the month's player names - rows of `times` are in this order
+#   offsets     bytes of an `array('B')`: for each date that has a rollup, its day of the month - 1
+#   updated_at  bytes of an `array('q')`: each of those dates' rollup `updated_at` (see `get_data`'s cursor)
+#   times       bytes of an `array('i')`: one row per player, one column per entry of `offsets`,
+#               with MISSING where that player has no score
+#
+# The arrays are stored little-endian, whatever the platform. An item is limited to 400KB, which at
+# 4 bytes per time is a few thousand players' worth of months - far more than a leaderboard holds.
+
+OFFSET_TYPECODE = 'B'
+UPDATED_AT_TYPECODE = 'q'
+TIME_TYPECODE = 'i'
+MISSING = -1
+
+
+def month_of(date: str) -> str:
+    return date[:7]
+
+
+def dates_in_month(month: str) -> List[str]:
+    year, month_number = int(month[:4]), int(month[5:7])
+    return [f'{month}-{day:02d}' for day in range(1, monthrange(year, month_number)[1] + 1)]
+
+
+def pack_month(month: str, rollups: Dict[str, dict]) -> dict:
+    # `rollups` is {date: rollup} for dates within `month` - only `players` and `updated_at` are kept
+    dates = sorted(rollups)
+    players = sorted({name for date in dates for name in rollups[date]['players']})
+    offsets = array(OFFSET_TYPECODE, [int(date[8:10]) - 1 for date in dates])
+    updated_at = array(UPDATED_AT_TYPECODE, [rollups[date].get('updated_at', 0) for date in dates])
+    times = array(TIME_TYPECODE, [rollups[date]['players'].get(name, MISSING)
+                                  for name in players for date in dates])
+    return {
+        'month': month,
+        'players': players,
+        'offsets': _to_bytes(offsets),
+        'updated_at': _to_bytes(updated_at),
+        'times': _to_bytes(times)
+    }
+
+
+def unpack_month(item: dict) -> Dict[str, dict]:
+    # The inverse of `pack_month` - returns {date: {'players': {name: time}, 'updated_at': ...}}
+    month = item['month']
+    offsets = _from_bytes(OFFSET_TYPECODE, item['offsets'])
+    updated_at = _from_bytes(UPDATED_AT_TYPECODE, item['updated_at'])
+    times = _from_bytes(TIME_TYPECODE, item['times'])
+    dates = [f'{month}-{offset + 1:02d}' for offset in offsets]
+    unpacked = {date: {'players': {}, 'updated_at': date_updated_at}
+                for date, date_updated_at in zip(dates, updated_at)}
+    width = len(dates)
+    for row, name in enumerate(item['players']):
+        start = row * width
+        for date, time in zip(dates, times[start:start + width]):
+            if time != MISSING:
+                unpacked[date]['players'][name] = time
+    return unpacked
+
+
+def _to_bytes(values: array) -> bytes:
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_bytes(typecode: str, blob) -> array:
+    values = array(typecode)
+    # boto3 wraps binary attributes in a `Binary`, whose `.value` is the raw bytes
+    values.frombytes(bytes(getattr(blob, 'value', blob)))
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
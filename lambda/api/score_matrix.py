@@ -0,0 +1,72 @@
+from array import array
+from math import isnan, nan, sqrt
+from typing import Dict, List
+
+# A dense dates × players grid of scores, built in a single pass over the daily rollups.
+#
+# Each player's row is an `array('d')` (i.e. a packed C array of doubles, rather than a list
+# of boxed Python objects), with NaN standing in for "no score on this date". Per-date
+# (column) statistics are accumulated while the grid is filled, rather than in a second pass.
+
+
+class ScoreMatrix:
+    def __init__(self, dates: List[str]):
+        self.dates = dates
+        self.date_index = {date: i for i, date in enumerate(dates)}
+        self.names = []
+        self.name_index = {}
+        self.rows = []
+        self.column_counts = array('l', [0]) * len(dates)
+        self.column_sums = array('d', [0.0]) * len(dates)
+        self.column_sums_of_squares = array('d', [0.0]) * len(dates)
+
+    @classmethod
+    def from_rollups(cls, rollups: Dict[str, dict]) -> 'ScoreMatrix':
+        matrix = cls(sorted(rollups))
+        for column, date in enumerate(matrix.dates):
+            rollup = rollups[date]
+            sum_of_squares = 0
+            for name, time in rollup['players'].items():
+                matrix._row_for(name)[column] = time
+                sum_of_squares += time * time
+            matrix.column_sums_of_squares[column] = sum_of_squares
+            # The rollups already hold the column aggregates, so there's no need to recompute them
+            matrix.column_counts[column] = rollup['count']
+            matrix.column_sums[column] = rollup['sum']
+        return matrix
+
+    def _row_for(self, name: str) -> array:
+        index = self.name_index.get(name)
+        if index is None:
+            index = self.name_index[name] = len(self.names)
+            self.names.append(name)
+            self.rows.append(array('d', [nan]) * len(self.dates))
+        return self.rows[index]
+
+    def column_floor_means(self) -> array:
+        # Floor-division, to match the behaviour of the original `average()`
+        return array('d', [total // count if count else nan
+                           for total, count in zip(self.column_sums, self.column_counts)])
+
+    def column_means(self) -> array:
+        return array('d', [total / count if count else nan
+                           for total, count in zip(self.column_sums, self.column_counts)])
+
+    def column_standard_deviations(self) -> array:
+        # Population standard deviation, from the running sums (E[x^2] - E[x]^2)
+        return array('d', [sqrt(max(squares / count - (total / count) ** 2, 0.0)) if count else nan
+                           for total, squares, count
+                           in zip(self.column_sums, self.column_sums_of_squares, self.column_counts)])
+
+    def to_response(self, rows: List[array] = None, as_int: bool = False, dates: List[str] = None) -> dict:
+        # Emits the `{'dates': [...], 'scores': {name: [...]}}` shape the frontend expects, with
+        # `None` for missing values. `rows` defaults to the raw scores, and `dates` to the matrix's
+        # own (pass both to emit rows that have been resampled onto different dates).
+        if rows is None:
+            rows = self.rows
+        convert = int if as_int else float
+        return {
+            'dates': self.dates if dates is None else dates,
+            'scores': {name: [None if isnan(value) else convert(value) for value in row]
+                       for name, row in zip(self.names, rows)}
+        }
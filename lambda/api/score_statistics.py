@@ -0,0 +1,161 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from math import isnan, nan
+from typing import Callable, Dict, List, Tuple
+
+from errors import BadRequestError
+from score_matrix import ScoreMatrix
+
+# Every statistic takes the shared ScoreMatrix (plus the request's query parameters) and returns
+# one row per player, aligned with `matrix.dates`, with NaN for "no value". Anything that depends on
+# earlier dates is carried forward incrementally as we walk along a row, rather than recomputed for
+# each output point.
+#
+# Register new statistics with `@statistic('<name>')` - the name is what the frontend sends as the
+# `statistic` query parameter.
+
+# name -> (function, whether its output should be rendered as integers)
+STATISTICS: Dict[str, Tuple[Callable, bool]] = {}
+
+DEFAULT_ROLLING_WINDOW = 7
+DATE_FORMAT = '%Y-%m-%d'
+
+
+def statistic(name: str, as_int: bool = False):
+    def register(function):
+        STATISTICS[name] = (function, as_int)
+        return function
+    return register
+
+
+def compute_statistic(name: str, matrix: ScoreMatrix, params: dict) -> dict:
+    rows, as_int = compute_statistic_rows(name, matrix, params)
+    return matrix.to_response(rows, as_int=as_int)
+
+
+def compute_statistic_rows(name: str, matrix: ScoreMatrix, params: dict) -> Tuple[List[array], bool]:
+    # Returns the statistic's rows, and whether they should be rendered as integers
+    if name not in STATISTICS:
+        raise BadRequestError(
+            f'Unknown statistic "{name}" - expected one of {", ".join(sorted(STATISTICS))}')
+    function, as_int = STATISTICS[name]
+    return function(matrix, params), as_int
+
+
+@statistic('standard', as_int=True)
+def standard(matrix: ScoreMatrix, params: dict):
+    return matrix.rows
+
+
+@statistic('deviation_from_average')
+def deviation_from_average(matrix: ScoreMatrix, params: dict):
+    averages = matrix.column_floor_means()
+    # Note - this is _not_ the proper mathematical definition of "variance".
+    # (Missing scores are NaN, which stays NaN through the arithmetic and comes out as `None`)
+    return [array('d', [(score - average) / average for score, average in zip(row, averages)])
+            for row in matrix.rows]
+
+
+@statistic('z_score')
+def z_score(matrix: ScoreMatrix, params: dict):
+    means = matrix.column_means()
+    deviations = matrix.column_standard_deviations()
+    # A date where everyone got the same time has no spread, so nobody is above or below it
+    return [array('d', [(score - mean) / deviation if deviation else score - mean
+                        for score, mean, deviation in zip(row, means, deviations)])
+            for row in matrix.rows]
+
+
+@statistic('rolling_average')
+def rolling_average(matrix: ScoreMatrix, params: dict):
+    # Mean of each player's scores over the last `window` calendar days (inclusive of the date itself)
+    window = _int_param(params, 'window', DEFAULT_ROLLING_WINDOW)
+    ordinals = _date_ordinals(matrix)
+    output = []
+    for row in matrix.rows:
+        averages = array('d', [nan]) * len(row)
+        total, count, oldest = 0.0, 0, 0
+        for i, score in enumerate(row):
+            if not isnan(score):
+                total += score
+                count += 1
+            # Drop everything that has fallen out of the window
+            while ordinals[i] - ordinals[oldest] >= window:
+                if not isnan(row[oldest]):
+                    total -= row[oldest]
+                    count -= 1
+                oldest += 1
+            if count:
+                averages[i] = total / count
+        output.append(averages)
+    return output
+
+
+@statistic('percentile_rank')
+def percentile_rank(matrix: ScoreMatrix, params: dict):
+    # Percentage of that day's scores that the player beat, counting ties as half - so the
+    # fastest player of the day is near 100, the slowest near 0.
+    output = [array('d', [nan]) * len(matrix.dates) for _ in matrix.rows]
+    for column in range(len(matrix.dates)):
+        times = sorted(row[column] for row in matrix.rows if not isnan(row[column]))
+        for row, ranks in zip(matrix.rows, output):
+            score = row[column]
+            if isnan(score):
+                continue
+            slower = len(times) - bisect_right(times, score)
+            tied = bisect_right(times, score) - bisect_left(times, score) - 1
+            ranks[column] = 100 * (slower + tied / 2) / len(times)
+    return output
+
+
+@statistic('personal_best', as_int=True)
+def personal_best(matrix: ScoreMatrix, params: dict):
+    # Each player's best time to date (only emitted on dates that they played)
+    output = []
+    for row in matrix.rows:
+        bests = array('d', [nan]) * len(row)
+        best = nan
+        for i, score in enumerate(row):
+            if isnan(score):
+                continue
+            if isnan(best) or score < best:
+                best = score
+            bests[i] = best
+        output.append(bests)
+    return output
+
+
+@statistic('streak', as_int=True)
+def streak(matrix: ScoreMatrix, params: dict):
+    # Number of consecutive calendar days (ending on this one) on which the player has a score
+    ordinals = _date_ordinals(matrix)
+    output = []
+    for row in matrix.rows:
+        streaks = array('d', [nan]) * len(row)
+        current, last_played = 0, None
+        for i, score in enumerate(row):
+            if isnan(score):
+                continue
+            current = current + 1 if last_played == ordinals[i] - 1 else 1
+            last_played = ordinals[i]
+            streaks[i] = current
+        output.append(streaks)
+    return output
+
+
+def _date_ordinals(matrix: ScoreMatrix):
+    return [datetime.strptime(date, DATE_FORMAT).toordinal() for date in matrix.dates]
+
+
+def _int_param(params: dict, name: str, default: int) -> int:
+    value = params.get(name)
+    if value is None:
+        return default
+    try:
+        parsed = int(value)
+    except ValueError:
+        raise BadRequestError(f'Parameter "{name}" must be an integer, got "{value}"')
+    if parsed < 1:
+        raise BadRequestError(f'Parameter "{name}" must be at least 1, got {parsed}')
+    return parsed
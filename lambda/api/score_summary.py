@@ -0,0 +1,159 @@
+from datetime import date as Date, datetime, timedelta
+from decimal import Decimal
+from typing import Dict, List
+
+from errors import BadRequestError
+
+# Per-player aggregates over calendar periods (served by `get_summary`), kept up-to-date as scores
+# are stored rather than recomputed from history - so reading one is O(players), however much
+# history there is. There's one summary per period of each window (e.g. `month#2021-02-01`, or just
+# `all`), holding for each player:
+#
+# * games, sum and wins - the mean is sum / games. A "win" is the fastest time of the day, and ties
+#   all count as a win; wins move between players as faster scores arrive during the day.
+# * histogram - {time (as a string, for Dynamo's sake): count}. The median and best time both come
+#   from this, and it grows with the number of distinct times rather than the number of games.
+# * streak_start/streak_end - the latest run of consecutive days played. A run can be extended in
+#   either direction, but dates further back than the day before it starts are ignored - so a
+#   backfill in random order can leave it short (see `rebuild_summaries`).
+
+DATE_FORMAT = '%Y-%m-%d'
+WINDOWS = ['week', 'month', 'year', 'all']
+
+
+def period_key(date: str, window: str) -> str:
+    # The key of the summary covering `date` in `window` - its first date, prefixed with the window
+    if window == 'all':
+        return 'all'
+    parsed = datetime.strptime(date, DATE_FORMAT).date()
+    if window == 'week':
+        # Weeks start on Monday
+        start = parsed - timedelta(days=parsed.weekday())
+    elif window == 'month':
+        start = Date(parsed.year, parsed.month, 1)
+    else:
+        start = Date(parsed.year, 1, 1)
+    return f'{window}#{start.strftime(DATE_FORMAT)}'
+
+
+def period_keys(date: str) -> List[str]:
+    # Every summary that a score on `date` counts towards
+    return [period_key(date, window) for window in WINDOWS]
+
+
+def new_summary() -> dict:
+    return {'last_date': None, 'players': {}}
+
+
+def from_item(item: dict) -> dict:
+    # Dynamo hands numbers back as `Decimal`s
+    return _ints(item)
+
+
+def apply_scores(summary: dict, date: str, old_players: Dict[str, int], new_players: Dict[str, int]):
+    # Updates `summary` for a date's scores changing from `old_players` to `new_players` (both
+    # {name: time}, i.e. the date's rollup before and after the write)
+    for name, new_time in new_players.items():
+        old_time = old_players.get(name)
+        if old_time == new_time:
+            continue
+        player = _player(summary, name)
+        if old_time is None or str(old_time) not in player['histogram']:
+            # A new score - or a changed one whose earlier time never made it into the summary
+            player['games'] += 1
+            _extend_streak(player, date)
+        else:
+            player['sum'] -= old_time
+            _remove_from_histogram(player['histogram'], old_time)
+        player['sum'] += new_time
+        player['histogram'][str(new_time)] = player['histogram'].get(str(new_time), 0) + 1
+
+    # Winners can be missing from the summary, if their (unchanged) score was stored before summaries
+    # existed - in which case there's no win of theirs to take back, and one to give starts from zero
+    old_winners, new_winners = _winners(old_players), _winners(new_players)
+    for name in old_winners - new_winners:
+        player = summary['players'].get(name)
+        if player is not None and player['wins']:
+            player['wins'] -= 1
+    for name in new_winners - old_winners:
+        _player(summary, name)['wins'] += 1
+
+    if new_players and (summary['last_date'] is None or date > summary['last_date']):
+        summary['last_date'] = date
+
+
+def summarise(summary: dict) -> Dict[str, dict]:
+    # {name: {'mean', 'median', 'best', 'games', 'wins', 'streak'}}. A streak only counts as current if
+    # it reaches the summary's latest date, or the day before (whose puzzle they may not have done yet).
+    latest = _ordinal(summary['last_date']) if summary['last_date'] else None
+    return {name: {
+        'mean': player['sum'] / player['games'],
+        'median': _histogram_median(player['histogram'], player['games']),
+        'best': min(int(time) for time in player['histogram']),
+        'games': player['games'],
+        'wins': player['wins'],
+        'streak': _ordinal(player['streak_end']) - _ordinal(player['streak_start']) + 1
+        if latest is not None and _ordinal(player['streak_end']) >= latest - 1 else 0
+    } for name, player in summary['players'].items() if player['games']}
+
+
+def parse_window(window) -> str:
+    if window is None:
+        return 'month'
+    if window not in WINDOWS:
+        raise BadRequestError(f'Unknown window "{window}" - expected one of {", ".join(WINDOWS)}')
+    return window
+
+
+def _player(summary: dict, name: str) -> dict:
+    return summary['players'].setdefault(name, {
+        'games': 0, 'sum': 0, 'wins': 0, 'histogram': {}, 'streak_start': None, 'streak_end': None})
+
+
+def _extend_streak(player: dict, date: str):
+    ordinal = _ordinal(date)
+    if player['streak_end'] is None or ordinal > _ordinal(player['streak_end']) + 1:
+        player['streak_start'] = player['streak_end'] = date
+    elif ordinal == _ordinal(player['streak_end']) + 1:
+        player['streak_end'] = date
+    elif ordinal == _ordinal(player['streak_start']) - 1:
+        player['streak_start'] = date
+
+
+def _remove_from_histogram(histogram: dict, time: int):
+    histogram[str(time)] -= 1
+    if not histogram[str(time)]:
+        del histogram[str(time)]
+
+
+def _winners(players: Dict[str, int]) -> set:
+    if not players:
+        return set()
+    best = min(players.values())
+    return {name for name, time in players.items() if time == best}
+
+
+def _histogram_median(histogram: dict, count: int) -> float:
+    # Walks the distinct times in order until reaching the middle one (or two)
+    middle = [(count - 1) // 2, count // 2]
+    values, seen = [], 0
+    for time in sorted(int(time) for time in histogram):
+        seen += histogram[str(time)]
+        while middle and middle[0] < seen:
+            values.append(time)
+            middle.pop(0)
+        if not middle:
+            break
+    return sum(values) / 2
+
+
+def _ordinal(date: str) -> int:
+    return datetime.strptime(date, DATE_FORMAT).toordinal()
+
+
+def _ints(value):
+    if isinstance(value, Decimal):
+        return int(value)
+    if isinstance(value, dict):
+        return {key: _ints(item) for key, item in value.items()}
+    return value
@@ -0,0 +1,80 @@
+import builtins
+import contextlib
+import json
+import os
+import sys
+from time import perf_counter_ns
+
+# Opt-in profiling of what a cold start spends its time on. With the environment variable
+# `profileStartup=true`, this logs (as one JSON object per line, so they can be queried with
+# CloudWatch Logs Insights):
+#
+# * every module import - with its own ("self") and cumulative time, like `python -X importtime` -
+#   tagged with whether it happened during init or during an invocation (i.e. a lazy import)
+# * how long the handler module took to initialise
+# * how long the first invocation of the container took, and which method it was for
+#
+# When disabled, none of the hooks are installed, and `invocation` is a no-op.
+
+ENABLED = os.environ.get('profileStartup', '').lower() == 'true'
+
+_original_import = builtins.__import__
+# One [module name, time spent in nested imports] per import currently in progress
+_import_stack = []
+_phase = 'init'
+_init_started_at = None
+_first_invocation_done = False
+
+
+def start():
+    global _init_started_at
+    if not ENABLED or _init_started_at is not None:
+        return
+    _init_started_at = perf_counter_ns()
+    builtins.__import__ = _profiled_import
+
+
+def finish_init():
+    global _phase
+    if not ENABLED or _phase != 'init':
+        return
+    _phase = 'invoke'
+    _emit({'event': 'init', 'init_ms': (perf_counter_ns() - _init_started_at) / 1e6})
+
+
+@contextlib.contextmanager
+def invocation(method: str):
+    global _first_invocation_done
+    if not ENABLED or _first_invocation_done:
+        yield
+        return
+    _first_invocation_done = True
+    started_at = perf_counter_ns()
+    try:
+        yield
+    finally:
+        _emit({'event': 'first_invocation', 'method': method,
+               'duration_ms': (perf_counter_ns() - started_at) / 1e6})
+
+
+def _profiled_import(name, globals=None, locals=None, fromlist=(), level=0):
+    # Already-imported modules cost (almost) nothing, and would just be noise
+    if level == 0 and name in sys.modules:
+        return _original_import(name, globals, locals, fromlist, level)
+
+    started_at = perf_counter_ns()
+    _import_stack.append([name, 0])
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        _, nested_ns = _import_stack.pop()
+        cumulative_ns = perf_counter_ns() - started_at
+        if _import_stack:
+            _import_stack[-1][1] += cumulative_ns
+        _emit({'event': 'import', 'phase': _phase, 'module': name, 'depth': len(_import_stack),
+               'self_us': (cumulative_ns - nested_ns) // 1000, 'cumulative_us': cumulative_ns // 1000})
+
+
+def _emit(record: dict):
+    record['startup_profile'] = True
+    print(json.dumps(record))
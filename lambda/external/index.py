@@ -1,17 +1,97 @@
+import base64
+import gzip
+import hashlib
+import importlib.util
 import json
+import logging
 import os
+import sys
 
 import boto3
+import metrics
+
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from time import monotonic
+from urllib import parse
+
+LOG = logging.getLogger(__name__)
+LOG.setLevel(logging.DEBUG)
 
 EXTENSION_TO_CONTENT_TYPE_MAP = {
     'js': 'text/javascript',
     'css': 'text/css',
     'yml': 'text/yaml',
-    'html': 'text/html'
+    'html': 'text/html',
+    'txt': 'text/plain',
+    'json': 'application/json',
+    'map': 'application/json',
+    'svg': 'image/svg+xml',
+    'png': 'image/png',
+    'jpg': 'image/jpeg',
+    'jpeg': 'image/jpeg',
+    'gif': 'image/gif',
+    'webp': 'image/webp',
+    'ico': 'image/x-icon',
+    'woff': 'font/woff',
+    'woff2': 'font/woff2',
+    'ttf': 'font/ttf',
+    'otf': 'font/otf'
 }
+# Anything else is returned base64-encoded (which API Gateway decodes on the way out)
+TEXT_CONTENT_TYPES = {'application/json', 'image/svg+xml'}
+
+# Static assets are kept in memory (up to this many bytes in total, least-recently-used evicted
+# first), and only re-checked against S3 - with a conditional GET - once they're this old.
+ASSET_CACHE_MAX_BYTES = 32 * 1024 * 1024
+ASSET_REVALIDATE_SECONDS = 60
+ASSET_CACHE_CONTROL = 'public, max-age=300'
+
+# `errorType`s (i.e. exception class names) raised by the API Lambda that are the caller's fault.
+# See `lambda/api/errors.py`
+API_ERROR_STATUS_CODES = {
+    'BadRequestError': 400
+}
+
+# 'invoke' calls the API Lambda over the network; 'in_process' imports its code (shipped to this
+# Lambda as a layer) and calls it directly, saving a hop, a second cold start, and a round of
+# JSON (de)serialisation.
+API_DISPATCH_MODE = os.environ.get('apiDispatchMode', 'invoke')
+API_MODULE_PATH = os.environ.get('apiModulePath', '/opt/python/index.py')
+
+# API methods whose responses depend only on their query string, and so can be cached
+CACHEABLE_API_METHODS = {'get_data', 'get_summary'}
+RESPONSE_CACHE_MAX_ENTRIES = 256
+# Today's scores keep changing as people finish the puzzle, so ranges that include it are only
+# cached briefly. Past dates never change once the day is over.
+LIVE_RESPONSE_TTL_SECONDS = 60
+SETTLED_RESPONSE_TTL_SECONDS = 24 * 60 * 60
+# Not worth the CPU (or the base64 overhead) to compress tiny bodies
+MIN_COMPRESSIBLE_BYTES = 1024
+DATE_FORMAT = '%Y-%m-%d'
+
+# Created once per container and reused by every warm invocation
+BOTO_CONFIG = Config(max_pool_connections=25)
+_clients = {}
+# Normalised request -> cached response, least-recently-used first
+_response_cache = OrderedDict()
+# S3 key -> {'body', 'etag', 'checked_at'}, least-recently-used first
+_asset_cache = OrderedDict()
+_asset_cache_bytes = 0
+# The API Lambda's `index` module, when dispatching in-process (loaded on first use, so that
+# requests for static content never pay for it)
+_api_module = None
 
 
 def handler(event, context):
+    route = 'api' if event['path'].split('/')[1] == 'api' else 'static'
+    with metrics.invocation(function='external', route=route):
+        return _handle(event, context)
+
+
+def _handle(event, context):
     split_path = event['path'].split('/')
     first_path_part = split_path[1]  # Yes, 1 - the 0th element is `''`
     if first_path_part == 'api':
@@ -24,19 +104,21 @@ def handler(event, context):
             }
 
         event['path'] = '/' + '/'.join(split_path[2:])
+        if event.get('isBase64Encoded') and event.get('body'):
+            # API Gateway base64-encodes request bodies when binary media types are enabled;
+            # the API Lambda expects plain text
+            event['body'] = base64.b64decode(event['body']).decode('utf-8')
+            event['isBase64Encoded'] = False
 
-        responseBody = boto3.client('lambda').invoke(
-            FunctionName=os.environ['apiFunctionArn'],
-            Payload=json.dumps(event))
-        return {
-            'statusCode': responseBody['StatusCode'],
-            'body': responseBody['Payload'].read().decode('utf-8'),
-            'headers': {
-                # RIP
-                'X-Clacks-Overhead': 'GNU Terry Pratchett',
-                'Content-Type': 'application/json'
-            }
-        }
+        cache_key = _get_cache_key(event)
+        cached = _get_cached_response(cache_key)
+        metrics.count('api.response_cache_hits' if cached is not None else 'api.response_cache_misses')
+        if cached is None:
+            with metrics.span('api.dispatch'):
+                cached = _call_api(event, context)
+            if cache_key is not None and cached['statusCode'] == 200:
+                _put_cached_response(cache_key, cached, _get_ttl_seconds(event))
+        return _build_api_response(event, cached)
 
     else:  # That is - this was not an API request
         key = event['path'][1:]
@@ -49,18 +131,226 @@ def handler(event, context):
         if not any([key.endswith('.'+ext) for ext in EXTENSION_TO_CONTENT_TYPE_MAP]):
             key = key+'.html'
 
-        print(f'Retrieving static content for {key}')
-        obj = boto3.resource('s3') \
-            .Object(os.environ["staticSiteBucket"], key)
+        asset = _get_asset(key)
+        if asset is None:
+            return {'statusCode': 404, 'body': f'No such file: {key}'}
+
+        headers = {
+            'Content-Type': _get_content_type_from_key(event['path'][1:]),
+            'ETag': asset['etag'],
+            'Cache-Control': ASSET_CACHE_CONTROL
+        }
+        if _get_header(event, 'If-None-Match') == asset['etag']:
+            return {'statusCode': 304, 'body': '', 'headers': headers}
+        if _is_text(headers['Content-Type']):
+            return {'statusCode': 200, 'body': asset['body'].decode('utf-8'), 'headers': headers}
         return {
             'statusCode': 200,
-            'body': obj.get()['Body'].read().decode('utf-8'),
-            'headers': {
-                'Content-Type': _get_content_type_from_key(event['path'][1:])
-            }
+            'body': base64.b64encode(asset['body']).decode('ascii'),
+            'isBase64Encoded': True,
+            'headers': headers
+        }
+
+
+def _get_asset(key):
+    # Returns `None` if there's no such object
+    global _asset_cache_bytes
+    cached = _asset_cache.get(key)
+    if cached is not None and monotonic() - cached['checked_at'] < ASSET_REVALIDATE_SECONDS:
+        _asset_cache.move_to_end(key)
+        metrics.count('static.cache_hits')
+        return cached
+
+    request = {'Bucket': os.environ['staticSiteBucket'], 'Key': key}
+    if cached is not None:
+        request['IfNoneMatch'] = cached['etag']
+    try:
+        with metrics.span('static.s3_get'):
+            response = _get_client('s3').get_object(**request)
+    except ClientError as e:
+        error_code = e.response.get('Error', {}).get('Code')
+        if error_code in ('304', 'NotModified'):
+            metrics.count('static.revalidated')
+            cached['checked_at'] = monotonic()
+            _asset_cache.move_to_end(key)
+            return cached
+        if error_code in ('NoSuchKey', '404', 'AccessDenied'):
+            # (Without ListBucket permission, S3 reports missing keys as AccessDenied)
+            _forget_asset(key)
+            return None
+        raise
+
+    _forget_asset(key)
+    metrics.count('static.fetched')
+    asset = {'body': response['Body'].read(), 'etag': response['ETag'], 'checked_at': monotonic()}
+    if len(asset['body']) <= ASSET_CACHE_MAX_BYTES:
+        _asset_cache[key] = asset
+        _asset_cache_bytes += len(asset['body'])
+        while _asset_cache_bytes > ASSET_CACHE_MAX_BYTES:
+            _, evicted = _asset_cache.popitem(last=False)
+            _asset_cache_bytes -= len(evicted['body'])
+    return asset
+
+
+def _forget_asset(key):
+    global _asset_cache_bytes
+    if key in _asset_cache:
+        _asset_cache_bytes -= len(_asset_cache.pop(key)['body'])
+
+
+def _is_text(content_type):
+    return content_type.startswith('text/') or content_type in TEXT_CONTENT_TYPES
+
+
+def _call_api(event, context):
+    if API_DISPATCH_MODE == 'in_process':
+        status_code, payload = _call_api_in_process(event, context)
+    else:
+        status_code, payload = _invoke_api(event)
+    return {
+        'statusCode': status_code,
+        'body': payload,
+        'etag': '"' + hashlib.md5(payload.encode('utf-8')).hexdigest() + '"',
+        'ttl': 0
+    }
+
+
+def _invoke_api(event):
+    responseBody = _get_client('lambda').invoke(
+        FunctionName=os.environ['apiFunctionArn'],
+        Payload=json.dumps(event))
+    payload = responseBody['Payload'].read().decode('utf-8')
+    return _get_status_code(responseBody, payload), payload
+
+
+def _call_api_in_process(event, context):
+    try:
+        result = _get_api_module().handler(event, context)
+        with metrics.span('api.serialize'):
+            return 200, json.dumps(result)
+    except Exception as e:
+        error_type = type(e).__name__
+        if error_type in API_ERROR_STATUS_CODES:
+            # The caller's fault - not worth a stack trace
+            LOG.info(f'API method rejected the request: {e!r}')
+        else:
+            LOG.exception('API method failed in-process')
+        # Same shape as the payload of a failed `invoke`
+        return API_ERROR_STATUS_CODES.get(error_type, 502), \
+            json.dumps({'errorMessage': str(e), 'errorType': error_type})
+
+
+def _get_api_module():
+    global _api_module
+    if _api_module is None:
+        # Both Lambdas' handlers live in a module called `index`, so the API's has to be loaded by
+        # path under a different name. Its own imports (`score_matrix` etc.) are resolved relative
+        # to its directory, which is already on the path when it's a layer.
+        api_directory = os.path.dirname(API_MODULE_PATH)
+        if api_directory not in sys.path:
+            sys.path.append(api_directory)
+        spec = importlib.util.spec_from_file_location('api_index', API_MODULE_PATH)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _api_module = module
+    return _api_module
+
+
+def _build_api_response(event, cached):
+    headers = {
+        # RIP
+        'X-Clacks-Overhead': 'GNU Terry Pratchett',
+        'Content-Type': 'application/json',
+        'ETag': cached['etag'],
+        'Cache-Control': f'public, max-age={cached["ttl"]}' if cached['ttl'] else 'no-cache',
+        'Vary': 'Accept-Encoding'
+    }
+    if cached['statusCode'] == 200 and _get_header(event, 'If-None-Match') == cached['etag']:
+        return {'statusCode': 304, 'body': '', 'headers': headers}
+
+    body = cached['body']
+    if len(body) >= MIN_COMPRESSIBLE_BYTES and 'gzip' in (_get_header(event, 'Accept-Encoding') or ''):
+        if 'gzipped_body' not in cached:
+            cached['gzipped_body'] = base64.b64encode(gzip.compress(body.encode('utf-8'))).decode('ascii')
+        headers['Content-Encoding'] = 'gzip'
+        return {
+            'statusCode': cached['statusCode'],
+            'body': cached['gzipped_body'],
+            'isBase64Encoded': True,
+            'headers': headers
         }
+    return {'statusCode': cached['statusCode'], 'body': body, 'headers': headers}
+
+
+def _get_cache_key(event):
+    # `None` if the request shouldn't be cached
+    method = event['path'].split('/')[1]
+    if method not in CACHEABLE_API_METHODS or event.get('httpMethod', 'GET') != 'GET':
+        return None
+    params = event.get('queryStringParameters') or {}
+    return method + '?' + parse.urlencode(sorted(params.items()))
+
+
+def _get_ttl_seconds(event):
+    params = event.get('queryStringParameters') or {}
+    date_range = params.get('date_range', '_').split('_')
+    # An open-ended (or default) range always includes today. Allowing an extra day's leeway
+    # because the NYT's idea of "today" isn't UTC's.
+    if len(date_range) != 2 or not date_range[1]:
+        return LIVE_RESPONSE_TTL_SECONDS
+    yesterday = (datetime.now(timezone.utc) - timedelta(days=1)).strftime(DATE_FORMAT)
+    if date_range[1] >= yesterday:
+        return LIVE_RESPONSE_TTL_SECONDS
+    return SETTLED_RESPONSE_TTL_SECONDS
+
+
+def _get_cached_response(cache_key):
+    if cache_key is None or cache_key not in _response_cache:
+        return None
+    cached = _response_cache[cache_key]
+    if cached['expires_at'] < monotonic():
+        del _response_cache[cache_key]
+        return None
+    _response_cache.move_to_end(cache_key)
+    return cached
+
+
+def _put_cached_response(cache_key, response, ttl_seconds):
+    response['ttl'] = ttl_seconds
+    response['expires_at'] = monotonic() + ttl_seconds
+    _response_cache[cache_key] = response
+    _response_cache.move_to_end(cache_key)
+    while len(_response_cache) > RESPONSE_CACHE_MAX_ENTRIES:
+        _response_cache.popitem(last=False)
+
+
+def _get_header(event, name):
+    # Header names are case-insensitive, and API Gateway passes them through as the client sent them
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == name.lower():
+            return value
+    return None
+
+
+def _get_status_code(invoke_response, payload):
+    # An exception in the API Lambda still comes back as a 200 from `invoke` - the failure is only
+    # signalled by `FunctionError`, with the details in the payload.
+    if 'FunctionError' not in invoke_response:
+        return invoke_response['StatusCode']
+    try:
+        error_type = json.loads(payload).get('errorType')
+    except ValueError:
+        error_type = None
+    return API_ERROR_STATUS_CODES.get(error_type, 502)
 
 
 def _get_content_type_from_key(key):
     # Default to text/html because we want to be able to reference html files as
     return EXTENSION_TO_CONTENT_TYPE_MAP.get(key.split('.')[-1], 'text/html')
+
+
+def _get_client(service_name):
+    if service_name not in _clients:
+        _clients[service_name] = boto3.client(service_name, config=BOTO_CONFIG)
+    return _clients[service_name]
+
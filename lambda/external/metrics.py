@@ -0,0 +1,130 @@
+import contextlib
+import json
+import os
+import threading
+import time
+from functools import wraps
+
+# Lightweight timing/counting for the hot paths, emitted as a single CloudWatch Embedded Metric
+# Format (EMF) log line per invocation - CloudWatch turns that into metrics without any API calls,
+# and the same line carries a trace of the invocation's (nested) spans for ad-hoc digging:
+#
+#   with metrics.invocation(function='api', method='get_data'):
+#       with metrics.span('get_data.fetch_rollups'):
+#           ...
+#       metrics.count('get_data.rollup_misses', len(missing_dates))
+#
+# Spans and counts outside of an invocation, or with `metricsEnabled=false`, are no-ops - and when
+# disabled, nothing is recorded at all.
+#
+# Both Lambdas have an identical copy of this file (lambda/api/metrics.py and lambda/external/metrics.py),
+# since they're deployed as separate assets - keep them in sync. When the external Lambda calls the API
+# in-process, the API's invocation nests inside the external one, and they share a single log line.
+
+ENABLED = os.environ.get('metricsEnabled', 'true').lower() == 'true'
+NAMESPACE = 'CrosswordStats'
+
+_NO_OP = contextlib.nullcontext()
+_lock = threading.Lock()
+# Per-thread stack of open span names, so that spans on worker threads don't get tangled up
+_local = threading.local()
+_current = None
+
+
+class _Invocation:
+    def __init__(self, dimensions):
+        self.dimensions = dimensions
+        self.started_at = time.perf_counter()
+        # metric name -> (unit, [values])
+        self.metrics = {}
+        self.trace = []
+
+    def record(self, name, value, unit):
+        with _lock:
+            self.metrics.setdefault(name, (unit, []))[1].append(value)
+
+    def to_emf(self):
+        record = {
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': NAMESPACE,
+                    'Dimensions': [list(self.dimensions)],
+                    'Metrics': [{'Name': name, 'Unit': unit} for name, (unit, _) in self.metrics.items()]
+                }]
+            },
+            'trace': self.trace
+        }
+        record.update(self.dimensions)
+        for name, (_, values) in self.metrics.items():
+            record[name] = values[0] if len(values) == 1 else values
+        return record
+
+
+@contextlib.contextmanager
+def _invocation(dimensions):
+    global _current
+    if _current is not None:
+        # Nested (i.e. the API called in-process by the external Lambda) - record it as a span of
+        # the outer invocation, which will emit everything
+        with span(':'.join(str(value) for value in dimensions.values())):
+            yield
+        return
+    _current = _Invocation(dimensions)
+    try:
+        yield
+    finally:
+        _current.record('duration', (time.perf_counter() - _current.started_at) * 1000, 'Milliseconds')
+        print(json.dumps(_current.to_emf()))
+        _current = None
+
+
+def invocation(**dimensions):
+    if not ENABLED:
+        return _NO_OP
+    return _invocation(dimensions)
+
+
+@contextlib.contextmanager
+def _span(name):
+    invocation_ = _current
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    started_at = time.perf_counter()
+    stack.append(name)
+    try:
+        yield
+    finally:
+        stack.pop()
+        duration_ms = (time.perf_counter() - started_at) * 1000
+        invocation_.record(name, duration_ms, 'Milliseconds')
+        with _lock:
+            invocation_.trace.append({
+                'name': name,
+                'parent': stack[-1] if stack else None,
+                'start_ms': round((started_at - invocation_.started_at) * 1000, 3),
+                'duration_ms': round(duration_ms, 3)
+            })
+
+
+def span(name: str):
+    if _current is None:
+        return _NO_OP
+    return _span(name)
+
+
+def timed(name: str):
+    # Decorator form of `span`
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name: str, value: int = 1):
+    if _current is not None:
+        _current.record(name, value, 'Count')
@@ -30,26 +30,100 @@ export class CrosswordStatsStack extends cdk.Stack {
       rootDomain: 'scubbo.org', // Replace this with your own domain!
       pathToAssetCode: 'lambda/api/',
     });
-    websiteAndApi.apiFunction.addToRolePolicy(new PolicyStatement({
+    // Everything that runs the API code - the external Lambda too, since it calls the API in-process
+    const apiHandlers = [websiteAndApi.apiFunction, websiteAndApi.externalFunction];
+    apiHandlers.forEach((apiHandler) => apiHandler.addToRolePolicy(new PolicyStatement({
       actions: ['cloudformation:DescribeStacks'],
       resources: ['*'],
-    }))
+    })));
 
     const scoreTable = new Table(this, 'Table', {
       partitionKey: { name: 'id', type: AttributeType.STRING },
       sortKey: { name: 'date', type: AttributeType.STRING },
     });
-    scoreTable.grantReadWriteData(websiteAndApi.apiFunction)
+    // `id` is a hash of date and name, so the base table can't answer "what happened on these dates?"
+    // without a full scan. This index lets `get_data` query one partition per day instead.
+    scoreTable.addGlobalSecondaryIndex({
+      indexName: 'date-index',
+      partitionKey: { name: 'date', type: AttributeType.STRING },
+      sortKey: { name: 'name', type: AttributeType.STRING },
+    });
+    apiHandlers.forEach((apiHandler) => {
+      scoreTable.grantReadWriteData(apiHandler);
+      // Saves the Lambda a DescribeStacks call to find the table (the output below is kept as a fallback)
+      apiHandler.addEnvironment('scoreTableName', scoreTable.tableName);
+    });
     new cdk.CfnOutput(this, 'score-table-name-output', {
       exportName: 'scoreTableName',
       value: scoreTable.tableName
     });
 
+    // One item per date, holding aggregates over that date's scores (maintained by `update_scores`),
+    // so that reads don't need to touch - or re-aggregate - the raw rows.
+    const rollupTable = new Table(this, 'RollupTable', {
+      partitionKey: { name: 'date', type: AttributeType.STRING },
+    });
+    apiHandlers.forEach((apiHandler) => {
+      rollupTable.grantReadWriteData(apiHandler);
+      apiHandler.addEnvironment('rollupTableName', rollupTable.tableName);
+    });
+    new cdk.CfnOutput(this, 'rollup-table-name-output', {
+      exportName: 'rollupTableName',
+      value: rollupTable.tableName
+    });
+
+    // One item per closed month, holding that month's scores packed into a few columnar blobs (built by
+    // `archive_scores`), so that long-range reads are a handful of fetches rather than one per date.
+    const archiveTable = new Table(this, 'ArchiveTable', {
+      partitionKey: { name: 'month', type: AttributeType.STRING },
+    });
+    apiHandlers.forEach((apiHandler) => {
+      archiveTable.grantReadWriteData(apiHandler);
+      apiHandler.addEnvironment('archiveTableName', archiveTable.tableName);
+    });
+    new cdk.CfnOutput(this, 'archive-table-name-output', {
+      exportName: 'archiveTableName',
+      value: archiveTable.tableName
+    });
+
+    // Per-player aggregates for each week, month, year and all-time (maintained by `update_scores`),
+    // so that `get_summary` reads one item however much history there is.
+    const summaryTable = new Table(this, 'SummaryTable', {
+      partitionKey: { name: 'period', type: AttributeType.STRING },
+    });
+    apiHandlers.forEach((apiHandler) => {
+      summaryTable.grantReadWriteData(apiHandler);
+      apiHandler.addEnvironment('summaryTableName', summaryTable.tableName);
+    });
+    new cdk.CfnOutput(this, 'summary-table-name-output', {
+      exportName: 'summaryTableName',
+      value: summaryTable.tableName
+    });
+
     const nytCookie = new Secret(this, 'Cookie-Secret', {
       secretName: 'nyt-cookie'
     });
-    nytCookie.grantRead(websiteAndApi.apiFunction);
-    nytCookie.grantWrite(websiteAndApi.apiFunction);
+    apiHandlers.forEach((apiHandler) => {
+      nytCookie.grantRead(apiHandler);
+      nytCookie.grantWrite(apiHandler);
+    });
+
+    // Further leaderboards to track alongside the default one (e.g. `cdk deploy -c groups=work,family`),
+    // each polled with the cookie from its own secret. Group names end up in storage keys and URLs,
+    // so keep them to letters, digits, `-` and `_`.
+    const groupSecrets: { [group: string]: string } = { default: 'nyt-cookie' };
+    const extraGroups: string[] = (this.node.tryGetContext('groups') ?? '').split(',').filter((group: string) => group);
+    extraGroups.forEach((group) => {
+      const groupCookie = new Secret(this, `Cookie-Secret-${group}`, {
+        secretName: `nyt-cookie-${group}`
+      });
+      apiHandlers.forEach((apiHandler) => {
+        groupCookie.grantRead(apiHandler);
+        groupCookie.grantWrite(apiHandler);
+      });
+      groupSecrets[group] = `nyt-cookie-${group}`;
+    });
+    apiHandlers.forEach((apiHandler) => apiHandler.addEnvironment('groupSecrets', JSON.stringify(groupSecrets)));
 
     new Rule(this, 'HeartbeatRule', {
       enabled: true,
@@ -64,11 +138,27 @@ export class CrosswordStatsStack extends cdk.Stack {
       ]
     });
 
+    // Daily rather than monthly, so that a month whose archive was dropped by a late score gets rebuilt promptly
+    new Rule(this, 'ArchiveRule', {
+      enabled: true,
+      schedule: Schedule.expression('rate(1 day)'),
+      targets: [
+        new LambdaFunction(websiteAndApi.apiFunction, {
+          event: RuleTargetInput.fromObject({
+            operation: 'archive_scores'
+          })
+        })
+      ]
+    });
+
     if (emailNotificationBoolean) {
       const emailNotificationTable = new Table(this, 'NotifyOnFailureTable', {
         partitionKey: { name: 'date', type: AttributeType.STRING }
       })
-      emailNotificationTable.grantReadWriteData(websiteAndApi.apiFunction)
+      apiHandlers.forEach((apiHandler) => {
+        emailNotificationTable.grantReadWriteData(apiHandler);
+        apiHandler.addEnvironment('emailTableName', emailNotificationTable.tableName);
+      });
       new cdk.CfnOutput(this, 'email-table-name-output', {
         exportName: 'emailTableName',
         value: emailNotificationTable.tableName
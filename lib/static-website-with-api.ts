@@ -1,11 +1,11 @@
 import * as cdk from '@aws-cdk/core';
-import {Fn} from '@aws-cdk/core';
+import {Duration, Fn} from '@aws-cdk/core';
 import {Bucket} from '@aws-cdk/aws-s3';
 import {BucketDeployment, Source} from "@aws-cdk/aws-s3-deployment";
 import {ARecord, HostedZone, IHostedZone, RecordTarget} from "@aws-cdk/aws-route53";
 import {strict as assert} from 'assert';
 import {AssetCode, Function, Runtime} from "@aws-cdk/aws-lambda";
-import {PythonFunction} from "@aws-cdk/aws-lambda-python";
+import {PythonFunction, PythonLayerVersion} from "@aws-cdk/aws-lambda-python";
 import {LambdaRestApi} from "@aws-cdk/aws-apigateway";
 import {ApiGateway} from "@aws-cdk/aws-route53-targets";
 import {Certificate, CertificateValidation} from "@aws-cdk/aws-certificatemanager";
@@ -20,11 +20,16 @@ export interface StaticWebsiteWithApiProps {
     apiLambda?: Function, // Exactly one of this and pathToAssetCode must be set
     pathToAssetCode?: string, // Exactly one of this and apiLambda must be set
     functionHandler?: string,
+    // If true (the default), the API code is also shipped to the external Lambda as a layer, and called
+    // in-process rather than via `lambda.invoke`. Only possible when pathToAssetCode is set.
+    inProcessApi?: boolean,
     [key: string]: any // This is necessary in order to do `props[propertyName]` -
 }
 
 export class StaticWebsiteWithApi extends cdk.Construct {
     apiFunction: Function;
+    // Externally accessed so that it can be granted the API's permissions when calling it in-process
+    externalFunction: Function;
     hostedZone: IHostedZone; // Externally accessed to permit SES-sending
     private staticSiteBucket: Bucket
 
@@ -58,21 +63,40 @@ export class StaticWebsiteWithApi extends cdk.Construct {
                     'stackId': Fn.sub('${AWS::StackId}')
                 },
                 logRetention: RetentionDays.ONE_WEEK,
+                // Long enough for `backfill_scores` to get through a useful range before it stops
+                // (it leaves itself a margin - see BACKFILL_SAFETY_MARGIN_MILLIS)
+                timeout: Duration.minutes(5),
                 runtime: Runtime.PYTHON_3_8,
             })
         }
 
+        const inProcessApi = (props.inProcessApi ?? true) && props.pathToAssetCode != undefined;
         const externalLambda = new Function(this, 'external-lambda', {
             code: new AssetCode('lambda/external/'),
             environment: {
                 stackId: Fn.sub('${AWS::StackId}'),
                 apiFunctionArn: this.apiFunction.functionArn,
-                staticSiteBucket: this.staticSiteBucket.bucketName
+                staticSiteBucket: this.staticSiteBucket.bucketName,
+                apiDispatchMode: inProcessApi ? 'in_process' : 'invoke'
             },
             handler: 'index.handler',
+            layers: inProcessApi ? [
+                // Bundled the same way as the API function itself (i.e. with its requirements),
+                // and unpacked under /opt/python - see `apiModulePath` in lambda/external/index.py
+                new PythonLayerVersion(this, 'api-layer', {
+                    entry: (props.pathToAssetCode as string),
+                    compatibleRuntimes: [Runtime.PYTHON_3_8]
+                })
+            ] : [],
             logRetention: RetentionDays.ONE_WEEK,
+            // Sized for the API methods it runs in-process (`get_data`'s statistics especially) rather
+            // than just for serving files - more memory also means more CPU. API Gateway gives up on
+            // an integration after 29 seconds, so there's no point in a longer timeout.
+            memorySize: 512,
+            timeout: Duration.seconds(29),
             runtime: Runtime.PYTHON_3_8
         })
+        this.externalFunction = externalLambda
         this.staticSiteBucket.grantRead(externalLambda)
         this.apiFunction.grantInvoke(externalLambda)
 
@@ -90,6 +114,9 @@ export class StaticWebsiteWithApi extends cdk.Construct {
             handler: externalLambda,
             proxy: true,
             deploy: true,
+            // Lets the external Lambda return gzipped (i.e. base64-encoded) bodies, which API Gateway
+            // decodes on the way out. Note that this also means request bodies arrive base64-encoded.
+            binaryMediaTypes: ['*/*'],
             domainName: {
                 domainName: domainName,
                 certificate: cert
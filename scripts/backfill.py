@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+# Runs `backfill_scores` from the API Lambda locally, against whatever AWS credentials and endpoints
+# are configured in the environment. Run from the root of the package:
+#
+#   $ python3 scripts/backfill.py 2021-01-01 2021-02-01
+#
+# To try it out without touching real resources, point boto3 at local stand-ins (e.g. DynamoDB Local
+# or `moto_server`) with the standard `AWS_ENDPOINT_URL_<SERVICE>` environment variables, set
+# `scoreTableName`/`rollupTableName`/`archiveTableName`/`summaryTableName` to the local tables, and
+# point `leaderboardHistoryUrl` at `scripts/fake-leaderboard-server.py`:
+#
+#   $ leaderboardHistoryUrl='http://localhost:8001/puzzles/leaderboards?date={date}' python3 scripts/backfill.py ...
+#
+# Re-running with the same range resumes an interrupted backfill. Backfilled dates arrive out of order,
+# which can leave `get_summary`'s streaks short - run `rebuild_summaries` over the whole history after.
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambda', 'api'))
+import index
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load past leaderboards into the score table')
+    parser.add_argument('start_date', help='YYYY-MM-DD (inclusive)')
+    parser.add_argument('end_date', help='YYYY-MM-DD (inclusive)')
+    parser.add_argument('--max-workers', type=int, default=index.DEFAULT_BACKFILL_WORKERS)
+    parser.add_argument('--group', default=index.DEFAULT_GROUP,
+                        help='which group to backfill (see `groupSecrets`)')
+    args = parser.parse_args()
+
+    result = index.backfill_scores({
+        'operation': 'backfill_scores',
+        'queryStringParameters': {
+            'date_range': f'{args.start_date}_{args.end_date}',
+            'max_workers': str(args.max_workers),
+            'group': args.group
+        }
+    }, None)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+# Times `/api/get_data` through the external Lambda's handler in both dispatch modes ('invoke' and
+# 'in_process'), with in-memory stand-ins for AWS (see `local_aws.py`). Run from the root of the package:
+#
+#   $ python3 scripts/benchmark-api-dispatch.py --days 365 --invoke-latency-ms 15
+#
+# `--invoke-latency-ms` stands in for the network hop of a real `lambda.invoke` (which is not
+# otherwise simulated); everything else - including the extra JSON round trips - is real.
+import argparse
+import importlib.util
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+SCRIPTS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+LAMBDA_DIRECTORY = os.path.join(SCRIPTS_DIRECTORY, '..', 'lambda')
+sys.path.insert(0, SCRIPTS_DIRECTORY)
+from local_aws import FakeDynamoDB, FakeLambda
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ['apiFunctionArn'] = 'local-api-function'
+os.environ['apiModulePath'] = os.path.join(LAMBDA_DIRECTORY, 'api', 'index.py')
+os.environ['scoreTableName'] = 'scores'
+os.environ['rollupTableName'] = 'rollups'
+os.environ['archiveTableName'] = 'archives'
+# Otherwise every request prints a line of metrics (set `metricsEnabled=true` to include their overhead)
+os.environ.setdefault('metricsEnabled', 'false')
+
+
+def load_external_module():
+    # As in Lambda, the external function's own directory comes first on the path
+    external_directory = os.path.join(LAMBDA_DIRECTORY, 'external')
+    sys.path.insert(0, external_directory)
+    spec = importlib.util.spec_from_file_location(
+        'external_index', os.path.join(external_directory, 'index.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def seed_rollups(dynamodb, days, players):
+    rng = random.Random(0)
+    start = date(2021, 1, 1)
+    for offset in range(days):
+        date_string = (start + timedelta(days=offset)).isoformat()
+        scores = {f'player-{i}': rng.randint(10, 300) for i in range(players)}
+        times = sorted(scores.values())
+        dynamodb.Table('rollups').put_item(Item={
+            'date': date_string, 'players': scores, 'count': len(times), 'sum': sum(times),
+            'min': times[0], 'max': times[-1], 'times': times, 'fingerprint': 'seeded'})
+    return f'{start.isoformat()}_{(start + timedelta(days=days - 1)).isoformat()}'
+
+
+def time_requests(external, event_factory, iterations):
+    durations = []
+    for _ in range(iterations):
+        # Measuring the dispatch, not the response cache
+        external._response_cache.clear()
+        start = time.perf_counter()
+        response = external.handler(event_factory(), None)
+        durations.append(time.perf_counter() - start)
+        assert response['statusCode'] == 200, response
+    return durations
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare in-process and invoke API dispatch')
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--players', type=int, default=8)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--invoke-latency-ms', type=float, default=15.0)
+    args = parser.parse_args()
+
+    external = load_external_module()
+    api = external._get_api_module()
+    dynamodb = FakeDynamoDB({'scores': ('id', 'date'), 'rollups': ('date',), 'archives': ('month',)})
+    api._resources['dynamodb'] = dynamodb
+    external._clients['lambda'] = FakeLambda(api.handler, args.invoke_latency_ms / 1000)
+    date_range = seed_rollups(dynamodb, args.days, args.players)
+
+    def event_factory():
+        return {'path': '/api/get_data', 'httpMethod': 'GET', 'headers': {},
+                'queryStringParameters': {'date_range': date_range}}
+
+    print(f'{args.days} days x {args.players} players, {args.iterations} requests per mode')
+    for mode in ['invoke', 'in_process']:
+        external.API_DISPATCH_MODE = mode
+        durations = sorted(time_requests(external, event_factory, args.iterations))
+        print(f'{mode:>10}: mean {1000 * statistics.mean(durations):.2f}ms, '
+              f'p50 {1000 * durations[len(durations) // 2]:.2f}ms, '
+              f'p95 {1000 * durations[int(len(durations) * 0.95)]:.2f}ms')
+
+
+if __name__ == '__main__':
+    main()
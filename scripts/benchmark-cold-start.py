@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+# Measures the cold-start cost of the API Lambda's methods, by running each one in a fresh Python
+# process (repeatedly) with in-memory stand-ins for AWS (see `local_aws.py`). Run from the root of
+# the package:
+#
+#   $ python3 scripts/benchmark-cold-start.py --runs 10 --profile
+#
+# Each run reports:
+# * import_ms - loading the handler module (i.e. Lambda's init phase)
+# * aws_setup_ms - importing boto3 and creating the clients/resources the method uses (these are
+#   real, but make no network calls - the calls themselves then go to the stand-ins)
+# * first_call_ms - the method's first invocation, including anything it imports lazily
+#
+# `--profile` additionally enables `startup_profile` and lists the slowest imports.
+# Point `--api-directory` at another checkout's `lambda/api` to compare against it.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SCRIPTS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_API_DIRECTORY = os.path.join(SCRIPTS_DIRECTORY, '..', 'lambda', 'api')
+
+# method -> (event, [(kind, service name)] that the method uses)
+METHODS = {
+    'get_data': ({'path': '/get_data', 'queryStringParameters': {'date_range': '2021-01-01_2021-01-31'}},
+                 [('resource', 'dynamodb')]),
+    'update_cookie': ({'path': '/update_cookie', 'body': 'NYT-S=abc'},
+                      [('client', 'secretsmanager')]),
+}
+
+CHILD_SCRIPT = '''
+import json, os, sys, time
+started_at = time.perf_counter()
+sys.path.insert(0, {api_directory!r})
+import index
+imported_at = time.perf_counter()
+
+sys.path.insert(0, {scripts_directory!r})
+from local_aws import FakeDynamoDB, FakeSecretsManager
+fakes = {{
+    'dynamodb': FakeDynamoDB({{'scores': ('id', 'date'), 'rollups': ('date',), 'archives': ('month',)}}),
+    'secretsmanager': FakeSecretsManager(),
+}}
+setup_started_at = time.perf_counter()
+for kind, service in {services!r}:
+    getattr(index, '_get_' + kind)(service)
+setup_finished_at = time.perf_counter()
+for kind, service in {services!r}:
+    getattr(index, '_' + kind + 's')[service] = fakes[service]
+
+call_started_at = time.perf_counter()
+index.handler({event!r}, None)
+finished_at = time.perf_counter()
+print(json.dumps({{'result': True,
+                  'import_ms': 1000 * (imported_at - started_at),
+                  'aws_setup_ms': 1000 * (setup_finished_at - setup_started_at),
+                  'first_call_ms': 1000 * (finished_at - call_started_at)}}))
+'''
+
+
+def run_once(api_directory, method, profile):
+    event, services = METHODS[method]
+    environment = dict(os.environ, AWS_DEFAULT_REGION=os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'),
+                       AWS_ACCESS_KEY_ID='local', AWS_SECRET_ACCESS_KEY='local',
+                       scoreTableName='scores', rollupTableName='rollups', archiveTableName='archives',
+                       profileStartup='true' if profile else 'false')
+    script = CHILD_SCRIPT.format(api_directory=api_directory, scripts_directory=SCRIPTS_DIRECTORY,
+                                 services=services, event=event)
+    output = subprocess.run([sys.executable, '-c', script], env=environment, check=True,
+                            capture_output=True, text=True).stdout
+    records = [json.loads(line) for line in output.splitlines() if line.startswith('{')]
+    result = next(record for record in records if record.get('result'))
+    imports = [record for record in records if record.get('event') == 'import']
+    return result, imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark API Lambda cold starts')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--methods', nargs='+', default=list(METHODS), choices=list(METHODS))
+    parser.add_argument('--api-directory', default=DEFAULT_API_DIRECTORY)
+    parser.add_argument('--profile', action='store_true')
+    parser.add_argument('--top', type=int, default=10, help='Slowest imports to list with --profile')
+    args = parser.parse_args()
+
+    for method in args.methods:
+        results, imports = [], []
+        for _ in range(args.runs):
+            result, run_imports = run_once(args.api_directory, method, args.profile)
+            results.append(result)
+            imports = run_imports
+        print(f'{method} (median of {args.runs} runs):')
+        for phase in ['import_ms', 'aws_setup_ms', 'first_call_ms']:
+            print(f'  {phase:>14}: {statistics.median(result[phase] for result in results):.1f}')
+        if args.profile:
+            print(f'  slowest top-level imports (last run):')
+            top_level = [record for record in imports if record['depth'] == 0]
+            for record in sorted(top_level, key=lambda r: -r['cumulative_us'])[:args.top]:
+                print(f'    {record["cumulative_us"] / 1000:8.1f}ms  {record["module"]} ({record["phase"]})')
+
+
+if __name__ == '__main__':
+    main()
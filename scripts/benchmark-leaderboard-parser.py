@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+# Checks the targeted leaderboard parser against the golden files in `scripts/fixtures/` (and, if
+# BeautifulSoup is installed, against the whole-document parsing it replaced), then times both.
+# Run from the root of the package:
+#
+#   $ python3 scripts/benchmark-leaderboard-parser.py
+import argparse
+import glob
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambda', 'api'))
+from leaderboard_parser import parse_leaderboard
+
+FIXTURES_DIRECTORY = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+# The BeautifulSoup-based implementation that `parse_leaderboard` replaced, kept here as a baseline
+def legacy_parse_leaderboard(html):
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, features="html.parser")
+    score_divs = [div for div in
+                  soup.find_all('div', {'class': 'lbd-score'})
+                  if 'no-rank' not in div['class']]
+    scores = [{
+        'name': div.find_all('p', {'class': 'lbd-score__name'})[0].text.replace('(you)', '').strip(),
+        'time': legacy_time(div)
+    } for div in score_divs]
+    date_string = soup.find_all('h3', {'class': 'lbd-type__date'})[0].text
+    split = date_string.split(' ')
+    month = str(['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December'].index(split[1])+1).rjust(2, '0')
+    return '-'.join([split[3], month, str(split[2][0: -1]).rjust(2, '0')]), scores
+
+
+def legacy_time(div):
+    split = div.find_all('p', {'class': 'lbd-score__time'})[0].text.split(':')
+    return 60*int(split[0]) + int(split[1])
+
+
+def have_beautifulsoup():
+    try:
+        import bs4
+        return True
+    except ImportError:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check and benchmark the leaderboard parser')
+    parser.add_argument('--number', type=int, default=200, help='Parses per timing run')
+    parser.add_argument('--padding', type=int, default=0,
+                        help='Copies of the page body to append, to simulate a heavier real page')
+    args = parser.parse_args()
+    compare_legacy = have_beautifulsoup()
+    if not compare_legacy:
+        print('BeautifulSoup is not installed - only checking against golden files')
+
+    for html_path in sorted(glob.glob(os.path.join(FIXTURES_DIRECTORY, '*.html'))):
+        with open(html_path) as f:
+            html = f.read()
+        with open(html_path[:-len('.html')] + '.expected.json') as f:
+            expected = json.load(f)
+
+        date, scores = parse_leaderboard(html)
+        assert {'date': date, 'scores': scores} == expected, f'{html_path} does not match its golden file'
+        if compare_legacy:
+            assert legacy_parse_leaderboard(html) == (date, scores), f'{html_path} differs from legacy parser'
+        print(f'{os.path.basename(html_path)}: matches')
+
+        # Filler that neither parser is interested in, but both have to read past
+        html = html.replace('</body>', '<div class="filler"><p>filler</p></div>' * args.padding + '</body>')
+        new_time = min(timeit.repeat(lambda: parse_leaderboard(html), number=args.number, repeat=3))
+        print(f'  targeted parser: {1000 * new_time / args.number:.3f}ms per parse')
+        if compare_legacy:
+            legacy_time_taken = min(timeit.repeat(lambda: legacy_parse_leaderboard(html), number=args.number, repeat=3))
+            print(f'  BeautifulSoup:   {1000 * legacy_time_taken / args.number:.3f}ms per parse '
+                  f'({legacy_time_taken / new_time:.2f}x)')
+
+
+if __name__ == '__main__':
+    main()
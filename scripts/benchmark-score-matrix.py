@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+# Compares the ScoreMatrix-based reformatting against the previous per-(name, date) dict-lookup
+# implementation, on synthetic rollups. Run from the root of the package:
+#
+#   $ python3 scripts/benchmark-score-matrix.py --dates 10000 --players 100
+import argparse
+import os
+import random
+import sys
+import timeit
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambda', 'api'))
+from score_matrix import ScoreMatrix
+from score_statistics import compute_statistic
+
+
+def build_rollups(num_dates, num_players, participation):
+    rng = random.Random(0)
+    names = [f'player-{i}' for i in range(num_players)]
+    start = date(2000, 1, 1)
+    rollups = {}
+    for offset in range(num_dates):
+        players = {name: rng.randint(10, 300) for name in names if rng.random() < participation}
+        if not players:
+            continue
+        times = sorted(players.values())
+        date_string = (start + timedelta(days=offset)).isoformat()
+        rollups[date_string] = {'date': date_string, 'players': players, 'count': len(times),
+                                'sum': sum(times), 'min': times[0], 'max': times[-1], 'times': times}
+    return rollups
+
+
+# The implementations that ScoreMatrix replaced, kept here as a baseline
+def legacy_standard(rollups):
+    dates = sorted(rollups)
+    names = legacy_names(rollups)
+    return {
+        'dates': dates,
+        'scores': {name: [rollups[date]['players'].get(name) for date in dates] for name in names}
+    }
+
+
+def legacy_deviation(rollups):
+    dates = sorted(rollups)
+    names = legacy_names(rollups)
+    averages = {date: rollup['sum'] // rollup['count'] for date, rollup in rollups.items()}
+    return_data = {'dates': dates, 'scores': {}}
+    for name in names:
+        personal_scores = []
+        for date in dates:
+            average_for_date = averages[date]
+            score = rollups[date]['players'].get(name)
+            if score is not None:
+                personal_scores.append((score - average_for_date) / average_for_date)
+            else:
+                personal_scores.append(None)
+        return_data['scores'][name] = personal_scores
+    return return_data
+
+
+def legacy_names(rollups):
+    names = {}
+    for date in sorted(rollups):
+        for name in rollups[date]['players']:
+            names[name] = None
+    return list(names)
+
+
+def matrix_standard(rollups):
+    return compute_statistic('standard', ScoreMatrix.from_rollups(rollups), {})
+
+
+def matrix_deviation(rollups):
+    return compute_statistic('deviation_from_average', ScoreMatrix.from_rollups(rollups), {})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark score-matrix reformatting')
+    parser.add_argument('--dates', type=int, default=10000)
+    parser.add_argument('--players', type=int, default=100)
+    parser.add_argument('--participation', type=float, default=0.8,
+                        help='Probability that a given player has a score on a given date')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rollups = build_rollups(args.dates, args.players, args.participation)
+    print(f'{len(rollups)} dates x {args.players} players')
+
+    for statistic, legacy, matrix in [('standard', legacy_standard, matrix_standard),
+                                      ('deviation_from_average', legacy_deviation, matrix_deviation)]:
+        assert legacy(rollups) == matrix(rollups), f'Outputs differ for {statistic}'
+        legacy_time = min(timeit.repeat(lambda: legacy(rollups), number=1, repeat=args.repeat))
+        matrix_time = min(timeit.repeat(lambda: matrix(rollups), number=1, repeat=args.repeat))
+        print(f'{statistic}: legacy {legacy_time:.3f}s, matrix {matrix_time:.3f}s '
+              f'({legacy_time / matrix_time:.2f}x)')
+
+
+if __name__ == '__main__':
+    main()
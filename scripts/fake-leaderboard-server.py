@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+# Serves a saved leaderboard page as a local stand-in for https://www.nytimes.com/puzzles/leaderboards,
+# with ETag/Last-Modified support, so that polling can be exercised without hitting the NYT.
+# The file is re-read on every request, so editing it simulates the leaderboard changing.
+#
+# Requests with a `?date=YYYY-MM-DD` query get the same page re-dated (with the times shuffled between
+# players, so that each day differs), to stand in for past leaderboards when testing backfills.
+#
+# Point the API Lambda at it with:
+#
+#   $ leaderboardUrl=http://localhost:8001/puzzles/leaderboards python3 ...
+import argparse
+import email.utils
+import hashlib
+import os
+import random
+import re
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib import parse
+
+
+class FakeLeaderboardHandler(BaseHTTPRequestHandler):
+    leaderboard_path = None
+    honour_conditional_requests = True
+
+    def do_GET(self):
+        with open(self.leaderboard_path, 'rb') as f:
+            body = f.read()
+        date = parse.parse_qs(parse.urlparse(self.path).query).get('date')
+        if date:
+            body = _redate(body.decode('utf-8'), date[0]).encode('utf-8')
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        last_modified = email.utils.formatdate(os.path.getmtime(self.leaderboard_path), usegmt=True)
+
+        if self.honour_conditional_requests and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if self.honour_conditional_requests:
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', last_modified)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _redate(html, date_string):
+    date = datetime.strptime(date_string, '%Y-%m-%d')
+    html = re.sub(r'(<h3 class="lbd-type__date">)[^<]*', r'\g<1>' + f'{date:%A, %B} {date.day}, {date.year}', html)
+    time_pattern = r'(<p class="lbd-score__time">)(\d+:\d\d)'
+    times = [match[1] for match in re.findall(time_pattern, html)]
+    random.Random(date_string).shuffle(times)
+    shuffled = iter(times)
+    return re.sub(time_pattern, lambda match: match.group(1) + next(shuffled), html)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a saved leaderboard page locally')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--leaderboard', default=os.path.join(os.path.dirname(__file__), 'fixtures', 'leaderboard.html'))
+    parser.add_argument('--no-conditional', action='store_true',
+                        help='Ignore If-None-Match and send no validators, like a server that doesn\'t support them')
+    args = parser.parse_args()
+
+    FakeLeaderboardHandler.leaderboard_path = args.leaderboard
+    FakeLeaderboardHandler.honour_conditional_requests = not args.no_conditional
+    print(f'Serving {args.leaderboard} on localhost:{args.port}')
+    ThreadingHTTPServer(('', args.port), FakeLeaderboardHandler).serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+# Load-tests `/api/get_data` against `test-site-locally.py --offline` (i.e. both Lambdas running
+# in-process against in-memory stand-ins for AWS), at each of several sizes of seeded history, and
+# reports latency percentiles and throughput. Run from the root of the package:
+#
+#   $ python3 scripts/load-test-local-site.py --days 30,365,1095 --requests 500 --concurrency 4
+#
+# Each request asks for one of `--distinct-ranges` random date ranges within the seeded history
+# (with a random statistic), so that - as with real traffic - some are served from the external
+# Lambda's response cache and some aren't. Pass `--distinct-ranges 0` for a new range every time.
+import argparse
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import requests
+
+PACKAGE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+STATISTICS = ['standard', 'deviation_from_average', 'z_score', 'rolling_average', 'percentile_rank',
+              'personal_best', 'streak']
+RANGE_LENGTHS = [7, 30, 90, 365, 3650]
+STARTUP_TIMEOUT_SECONDS = 120
+
+# Each load-generating thread reuses its own session (and so its connections)
+_sessions = threading.local()
+
+
+def start_site(port, days, players):
+    site = subprocess.Popen([sys.executable, 'test-site-locally.py', '--offline', '--quiet',
+                             '--port', str(port), '--seed-days', str(days), '--seed-players', str(players)],
+                            cwd=PACKAGE_DIRECTORY, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + STARTUP_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        if site.poll() is not None:
+            raise RuntimeError(f'test-site-locally.py exited with {site.returncode}')
+        try:
+            requests.get(f'http://localhost:{port}/api', timeout=1)
+            return site
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    site.terminate()
+    raise RuntimeError(f'test-site-locally.py did not start within {STARTUP_TIMEOUT_SECONDS}s')
+
+
+def make_query_factory(days, distinct_ranges):
+    rng = random.Random(0)
+    first_date = date.today() - timedelta(days=days - 1)
+
+    def random_query():
+        length = min(rng.choice(RANGE_LENGTHS), days)
+        start = first_date + timedelta(days=rng.randint(0, days - length))
+        return {'date_range': f'{start.isoformat()}_{(start + timedelta(days=length - 1)).isoformat()}',
+                'statistic': rng.choice(STATISTICS),
+                'max_points': '366'}
+
+    if not distinct_ranges:
+        return random_query
+    queries = [random_query() for _ in range(distinct_ranges)]
+    return lambda: rng.choice(queries)
+
+
+def timed_request(url, params):
+    if not hasattr(_sessions, 'session'):
+        _sessions.session = requests.Session()
+    started_at = time.perf_counter()
+    response = _sessions.session.get(url, params=params, headers={'Accept-Encoding': 'gzip'})
+    return time.perf_counter() - started_at, response.status_code
+
+
+def percentile(sorted_values, fraction):
+    # Nearest-rank
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def run_load(port, query_factory, request_count, concurrency):
+    url = f'http://localhost:{port}/api/get_data'
+    # Generated up-front (the factory isn't thread-safe), and excluded from the timings
+    queries = [query_factory() for _ in range(request_count)]
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda params: timed_request(url, params), queries))
+    elapsed = time.perf_counter() - started_at
+    return sorted(duration for duration, _ in results), \
+        sum(1 for _, status in results if status != 200), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test get_data against the offline local site')
+    parser.add_argument('--days', default='30,365,1095', help='comma-separated sizes of seeded history')
+    parser.add_argument('--players', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--distinct-ranges', type=int, default=50)
+    parser.add_argument('--port', type=int, default=8050)
+    args = parser.parse_args()
+
+    print(f'{args.players} players, {args.requests} requests at concurrency {args.concurrency}, '
+          f'{args.distinct_ranges or "unlimited"} distinct ranges')
+    for days in [int(days) for days in args.days.split(',')]:
+        site = start_site(args.port, days, args.players)
+        try:
+            query_factory = make_query_factory(days, args.distinct_ranges)
+            # Warm up (first-use imports, etc.) before measuring
+            run_load(args.port, query_factory, min(20, args.requests), 1)
+            durations, errors, elapsed = run_load(args.port, query_factory, args.requests, args.concurrency)
+        finally:
+            site.terminate()
+            site.wait()
+        print(f'{days:>6} days: p50 {1000 * percentile(durations, 0.50):.2f}ms, '
+              f'p95 {1000 * percentile(durations, 0.95):.2f}ms, '
+              f'p99 {1000 * percentile(durations, 0.99):.2f}ms, '
+              f'{len(durations) / elapsed:.1f} req/s'
+              + (f', {errors} errors' if errors else ''))
+
+
+if __name__ == '__main__':
+    main()
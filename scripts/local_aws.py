@@ -0,0 +1,135 @@
+# In-memory stand-ins for the AWS clients and resources used by the Lambdas, for benchmarks and local
+# runs that shouldn't touch (or pay for) real AWS. They implement only the calls this repo makes, and
+# are installed by putting them into a Lambda module's `_clients`/`_resources` caches, e.g.:
+#
+#   api._resources['dynamodb'] = FakeDynamoDB({'scores': ('id', 'date'), 'rollups': ('date',),
+#                                              'archives': ('month',)})
+import copy
+import hashlib
+import io
+import json
+import os
+import time
+from types import SimpleNamespace
+
+
+class FakeTable:
+    def __init__(self, name, key_names):
+        self.name = name
+        self.key_names = key_names
+        self.items = {}
+
+    def _key(self, item):
+        return tuple(item[key_name] for key_name in self.key_names)
+
+    def get_item(self, Key):
+        item = self.items.get(self._key(Key))
+        return {'Item': copy.deepcopy(item)} if item is not None else {}
+
+    def put_item(self, Item):
+        self.items[self._key(Item)] = copy.deepcopy(Item)
+        return {}
+
+    def delete_item(self, Key):
+        self.items.pop(self._key(Key), None)
+        return {}
+
+    def query(self, KeyConditionExpression, IndexName=None, ExclusiveStartKey=None):
+        # Only equality conditions (i.e. `Key('date').eq(...)`) are supported, and everything
+        # matching comes back in a single page
+        key, value = KeyConditionExpression.get_expression()['values']
+        items = [copy.deepcopy(item) for item in self.items.values() if item.get(key.name) == value]
+        return {'Items': items, 'Count': len(items)}
+
+
+class FakeDynamoDB:
+    # `tables` maps table name -> tuple of key attribute names
+    def __init__(self, tables):
+        self.tables = {name: FakeTable(name, key_names) for name, key_names in tables.items()}
+        # The resource's own client (which, for the real one, also takes plain Python values)
+        self.meta = SimpleNamespace(client=self)
+
+    def Table(self, name):
+        return self.tables[name]
+
+    def batch_get_item(self, RequestItems):
+        responses = {}
+        for table_name, request in RequestItems.items():
+            table = self.tables[table_name]
+            responses[table_name] = [item for item in
+                                     (table.get_item(key).get('Item') for key in request['Keys'])
+                                     if item is not None]
+        return {'Responses': responses, 'UnprocessedKeys': {}}
+
+    def batch_write_item(self, RequestItems):
+        for table_name, requests in RequestItems.items():
+            for request in requests:
+                self.tables[table_name].put_item(request['PutRequest']['Item'])
+        return {'UnprocessedItems': {}}
+
+    def transact_write_items(self, TransactItems):
+        for request in TransactItems:
+            self.tables[request['Put']['TableName']].put_item(request['Put']['Item'])
+        return {}
+
+
+class FakeSecretsManager:
+    def __init__(self, secrets=None):
+        self.secrets = dict(secrets or {})
+
+    def get_secret_value(self, SecretId):
+        return {'SecretString': self.secrets.get(SecretId, '')}
+
+    def put_secret_value(self, SecretId, SecretString):
+        self.secrets[SecretId] = SecretString
+        return {}
+
+
+class FakeS3:
+    # Serves objects from a local directory (the bucket is ignored), with S3's ETags and error codes
+    def __init__(self, directory):
+        self.directory = directory
+
+    def get_object(self, Bucket, Key, IfNoneMatch=None):
+        from botocore.exceptions import ClientError
+        path = os.path.join(self.directory, *Key.split('/'))
+        if not os.path.isfile(path):
+            raise ClientError({'Error': {'Code': 'NoSuchKey', 'Message': Key}}, 'GetObject')
+        with open(path, 'rb') as f:
+            body = f.read()
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        if IfNoneMatch == etag:
+            raise ClientError({'Error': {'Code': '304', 'Message': 'Not Modified'}}, 'GetObject')
+        return {'Body': io.BytesIO(body), 'ETag': etag, 'ContentLength': len(body)}
+
+
+class FakeCloudFormation:
+    # Just enough of the CloudFormation resource to look up a stack's outputs. `outputs` maps
+    # export name -> value (e.g. table names), and every stack name gets the same outputs.
+    def __init__(self, outputs):
+        self.outputs = [{'OutputKey': name, 'OutputValue': value, 'ExportName': name}
+                        for name, value in outputs.items()]
+        self.stacks = SimpleNamespace(filter=self._filter_stacks)
+
+    def _filter_stacks(self, StackName):
+        return [SimpleNamespace(stack_name=StackName, outputs=self.outputs)]
+
+
+class FakeLambda:
+    # "Invokes" a handler in-process, with the same JSON round trips as the real thing, plus an
+    # optional fixed delay to stand in for the network hop
+    def __init__(self, handler, latency_seconds=0.0):
+        self.handler = handler
+        self.latency_seconds = latency_seconds
+
+    def invoke(self, FunctionName, Payload):
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        response = {'StatusCode': 200}
+        try:
+            payload = json.dumps(self.handler(json.loads(Payload), None))
+        except Exception as e:
+            response['FunctionError'] = 'Unhandled'
+            payload = json.dumps({'errorMessage': str(e), 'errorType': type(e).__name__})
+        response['Payload'] = io.BytesIO(payload.encode('utf-8'))
+        return response
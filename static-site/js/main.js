@@ -6,8 +6,22 @@ $(document).ready(function() {
     })
 });
 
+// Long ranges get bucketed server-side (e.g. into weekly averages) so the chart stays readable
+const MAX_POINTS = 366
+// Which group's leaderboard to show - taken from the page's own `?group=...`, else the default group
+const GROUP = new URLSearchParams(window.location.search).get('group')
+
+// The chart currently on the page, the arguments it was drawn with, and the cursor from its last
+// response - so that refreshing the same view only fetches (and redraws) what has changed.
+var chart = undefined
+var chart_args = undefined
+var cursor = undefined
+
 function reset_graph(start_date, end_date, statistic) {
-    args = {}
+    args = {'max_points': MAX_POINTS}
+    if (GROUP) {
+        args['group'] = GROUP
+    }
     if (start_date !== undefined) {
         args['date_range'] = start_date + '_' + end_date
     }
@@ -15,41 +29,110 @@ function reset_graph(start_date, end_date, statistic) {
         args['statistic'] = statistic
     }
 
+    if (chart !== undefined && JSON.stringify(args) === JSON.stringify(chart_args)) {
+        $.get('/api/get_data',
+            $.extend({'since': cursor}, args),
+            function(data) {
+                // The API sends everything again (without `delta`) when the dates may have moved -
+                // e.g. when they've been bucketed differently - in which case the chart is redrawn
+                if (data['delta']) {
+                    cursor = data['cursor']
+                    merge_into_chart(data)
+                } else {
+                    draw_chart(data, args)
+                }
+            });
+        return
+    }
+
     $.get('/api/get_data',
         args,
         function(data) {
+            draw_chart(data, args)
+        });
+}
+
+function draw_chart(data, args) {
+    var ctx = document.getElementById('scoreChart').getContext('2d');
+    datasets = []
+
+    // Renaming and restructing from what makes sense for the API,
+    // to what chart.js expects.
+    // If Javascript has dict-comprehensions like Python,
+    // please let me know!
+    colours = palette()
+    for (name in data['scores']) {
+        datasets.push({
+            label: name,
+            data: data['scores'][name],
+            fill: false,
+            borderColor: colours.pop()
+        })
+    }
+    if (chart !== undefined) {
+        chart.destroy()
+    }
+    chart = new Chart(ctx, {
+        type: 'line',
+        data: {
+            labels: data['dates'],
+            datasets: datasets
+        },
+    });
+    chart_args = args
+    cursor = data['cursor']
+    // I don't know why, but graph.js seems to override the canvas' `width/height` values
+    $('#scoreChart').css('height', 800);
+    $('#scoreChart').css('width', 1600);
+}
 
-        var ctx = document.getElementById('scoreChart').getContext('2d');
-        datasets = []
-
-        // I stole these from https://venngage.com/blog/color-blind-friendly-palette -
-        // but, not being colour-blind myself, I can't test them
-        // for suitability.
-        // TODO - more colours (will be necessary to
-        // display more than four players' scores!)
-        colours = ['#0f2080', '#85c0f9', '#a95aa1', '#f5793a']
-
-        // Renaming and restructing from what makes sense for the API,
-        // to what chart.js expects.
-        // If Javascript has dict-comprehensions like Python,
-        // please let me know!
-        for (name in data['scores']) {
-            datasets.push({
-                label: name,
-                data: data['scores'][name],
-                fill: false,
-                borderColor: colours.pop()
+// A delta response holds every date from the earliest change onwards (with players who have no
+// values there left out) - overwrite those dates in place, append any new ones, and redraw.
+function merge_into_chart(data) {
+    if (data['dates'].length == 0) {
+        return
+    }
+    var labels = chart.data.labels
+    for (var i = 0; i < data['dates'].length; i++) {
+        var date = data['dates'][i]
+        var column = labels.indexOf(date)
+        if (column == -1) {
+            labels.push(date)
+            column = labels.length - 1
+            chart.data.datasets.forEach(function(dataset) {
+                dataset.data.push(null)
             })
         }
-        var myChart = new Chart(ctx, {
-            type: 'line',
-            data: {
-                labels: data['dates'],
-                datasets: datasets
-            },
-        });
-        // I don't know why, but graph.js seems to override the canvas' `width/height` values
-        $('#scoreChart').css('height', 800);
-        $('#scoreChart').css('width', 1600);
-    });
-}
\ No newline at end of file
+        for (var name in data['scores']) {
+            dataset_for(name).data[column] = data['scores'][name][i]
+        }
+    }
+    chart.update()
+}
+
+function dataset_for(name) {
+    for (var j in chart.data.datasets) {
+        if (chart.data.datasets[j].label == name) {
+            return chart.data.datasets[j]
+        }
+    }
+    // Somebody new has joined the leaderboard
+    var colours = palette().slice(0, -chart.data.datasets.length || undefined)
+    var dataset = {
+        label: name,
+        data: chart.data.labels.map(function() { return null }),
+        fill: false,
+        borderColor: colours.pop()
+    }
+    chart.data.datasets.push(dataset)
+    return dataset
+}
+
+function palette() {
+    // I stole these from https://venngage.com/blog/color-blind-friendly-palette -
+    // but, not being colour-blind myself, I can't test them
+    // for suitability.
+    // TODO - more colours (will be necessary to
+    // display more than four players' scores!)
+    return ['#0f2080', '#85c0f9', '#a95aa1', '#f5793a']
+}
@@ -1,17 +1,47 @@
 #!/usr/bin/env python3
 
-from http.server import HTTPServer, CGIHTTPRequestHandler
+# Serves the static site locally, with `/api` either proxied to a deployed stack:
+#
+#   $ python3 test-site-locally.py --domain https://crossword.example.org
+#
+# or - with `--offline` - handled by running both Lambdas in-process, against in-memory stand-ins for
+# DynamoDB, S3, Secrets Manager and CloudFormation (see `scripts/local_aws.py`) seeded with random
+# scores, so that nothing touches AWS at all:
+#
+#   $ python3 test-site-locally.py --offline --seed-days 365 --seed-players 8
+#
+# In offline mode, static files are served by the external Lambda too (from `static-site/`, standing
+# in for the bucket), so every request goes down the same path as it would when deployed.
+# `scripts/load-test-local-site.py` uses this mode to measure `get_data` under load.
+
+from http.server import ThreadingHTTPServer, CGIHTTPRequestHandler, BaseHTTPRequestHandler
 import os
+import sys
+PACKAGE_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
 # This assumes that the script will be called from the root of the package.
 # If called from within `scripts/`, then this should be `../static-site` - but I think that will
 # be rare enough that we don't need an option flag for that.
 os.chdir('static-site')
 import argparse
+import base64
+import importlib.util
+import random
 import re
+import threading
 import requests
 
+from datetime import date, timedelta
+from urllib import parse
+
+LAMBDA_DIRECTORY = os.path.join(PACKAGE_DIRECTORY, 'lambda')
+SEED_PLAYERS = ['Alice', 'Bob', 'Carol', 'Dave', 'Erin', 'Frank', 'Grace', 'Heidi', 'Ivan', 'Judy']
+
 
 class LambdaDelegatingHandler(CGIHTTPRequestHandler):
+    # `requests.Session`s (and so their connection pools) are reused across requests, but aren't
+    # guaranteed thread-safe - so each of the server's threads gets its own.
+    _sessions = threading.local()
+
     def do_POST(self):
         if self.path.split('/')[1] == 'api':
             self._delegate('post')
@@ -48,26 +78,140 @@ class LambdaDelegatingHandler(CGIHTTPRequestHandler):
         return cls.target_domain
 
     def _make_request(self, method, url):
-        session = requests.Session()
+        session = self._get_session()
         data = self.rfile.read(int(self.headers.get('content-length', 0)))
         if data:
             return getattr(session, method)(url, data=data.decode('utf-8'))
         else:
             return getattr(session, method)(url)
 
+    @classmethod
+    def _get_session(cls):
+        if not hasattr(cls._sessions, 'session'):
+            cls._sessions.session = requests.Session()
+        return cls._sessions.session
+
+
+class OfflineLambdaHandler(BaseHTTPRequestHandler):
+    # Turns each request into an API Gateway proxy event for the external Lambda's handler, and its
+    # response back into HTTP. Set up by `build_offline_lambda`.
+    lambda_handler = None
+    # Like a single warm Lambda container, only one invocation runs at a time (the Lambdas' module
+    # state isn't built for concurrent invocations) - the server's threads just handle the I/O.
+    invocation_lock = threading.Lock()
+    quiet = False
+
+    def do_GET(self):
+        self._invoke()
+
+    def do_POST(self):
+        self._invoke()
+
+    def _invoke(self):
+        url = parse.urlsplit(self.path)
+        body = self.rfile.read(int(self.headers.get('content-length', 0)))
+        event = {
+            'path': url.path,
+            'httpMethod': self.command,
+            'headers': dict(self.headers),
+            # API Gateway sends `None`, rather than an empty dict, when there's no query string
+            'queryStringParameters': dict(parse.parse_qsl(url.query)) or None,
+            'body': body.decode('utf-8') if body else None,
+            'isBase64Encoded': False
+        }
+        with self.invocation_lock:
+            response = self.lambda_handler(event, None)
+
+        response_body = response.get('body') or ''
+        response_body = base64.b64decode(response_body) if response.get('isBase64Encoded') \
+            else response_body.encode('utf-8')
+        self.send_response(response['statusCode'])
+        for header_key, header_value in (response.get('headers') or {}).items():
+            self.send_header(header_key, header_value)
+        self.send_header('Content-Length', str(len(response_body)))
+        self.end_headers()
+        self.wfile.write(response_body)
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+
+def build_offline_lambda(args):
+    # Returns the external Lambda's handler, calling the API in-process, with the AWS services both
+    # use replaced by seeded in-memory stand-ins
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    os.environ['apiDispatchMode'] = 'in_process'
+    os.environ['apiModulePath'] = os.path.join(LAMBDA_DIRECTORY, 'api', 'index.py')
+    os.environ['staticSiteBucket'] = 'static-site'
+    # Otherwise every request prints a line of metrics
+    os.environ.setdefault('metricsEnabled', 'false')
+    # Table names are deliberately left for the API to look up from the (fake) stack outputs, as it
+    # would without the environment variables
+    for export_name in ['scoreTableName', 'rollupTableName', 'archiveTableName', 'summaryTableName']:
+        os.environ.pop(export_name, None)
+
+    sys.path.insert(0, os.path.join(PACKAGE_DIRECTORY, 'scripts'))
+    from local_aws import FakeCloudFormation, FakeDynamoDB, FakeS3, FakeSecretsManager
+
+    # As in Lambda, the external function's own directory comes first on the path
+    external_directory = os.path.join(LAMBDA_DIRECTORY, 'external')
+    sys.path.insert(0, external_directory)
+    spec = importlib.util.spec_from_file_location('external_index', os.path.join(external_directory, 'index.py'))
+    external = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(external)
+    api = external._get_api_module()
+
+    external._clients['s3'] = FakeS3(os.getcwd())
+    api._resources['dynamodb'] = FakeDynamoDB({'scores': ('id', 'date'), 'rollups': ('date',),
+                                               'archives': ('month',), 'summaries': ('period',)})
+    api._resources['cloudformation'] = FakeCloudFormation({
+        'scoreTableName': 'scores', 'rollupTableName': 'rollups', 'archiveTableName': 'archives',
+        'summaryTableName': 'summaries'})
+    api._clients['secretsmanager'] = FakeSecretsManager({api.SECRET_ID: 'NYT-S=offline'})
+
+    seed_scores(api, args.seed_days, args.seed_players)
+    return external.handler
+
+
+def seed_scores(api, days, players):
+    # Stores random scores through the API's own write path (so rollups are maintained as they
+    # would be by polling), ending today, and then archives the closed months
+    rng = random.Random(0)
+    names = [SEED_PLAYERS[i] if i < len(SEED_PLAYERS) else f'Player {i}' for i in range(players)]
+    start_date = date.today() - timedelta(days=days - 1)
+    for offset in range(days):
+        date_string = (start_date + timedelta(days=offset)).isoformat()
+        # Not everybody plays every day
+        api._store_scores(date_string, [{'name': name, 'time': rng.randint(15, 300)}
+                                        for name in names if rng.random() < 0.85])
+    api.archive_scores({'queryStringParameters': {
+        'date_range': f'{start_date.isoformat()}_{date.today().isoformat()}'}}, None)
+    print(f'Seeded {days} days of scores for {players} players, from {start_date.isoformat()}')
+
 
-def run(args, server_class=HTTPServer, handler_class=LambdaDelegatingHandler):
+def run(args, server_class=ThreadingHTTPServer, handler_class=LambdaDelegatingHandler):
     server_address = ('', args.port)
+    if args.offline:
+        handler_class = OfflineLambdaHandler
+        handler_class.lambda_handler = staticmethod(build_offline_lambda(args))
+        handler_class.quiet = args.quiet
     httpd = server_class(server_address, handler_class)
-    httpd.RequestHandlerClass.set_target_domain(f'{args.domain}')
-    print(f'Go to localhost:{args.port} to test')
+    if not args.offline:
+        httpd.RequestHandlerClass.set_target_domain(f'{args.domain}')
+    print(f'Go to localhost:{args.port} to test', flush=True)
     httpd.serve_forever()
 
 
 def main():
     parser = argparse.ArgumentParser(description='Run a website for local testing')
     parser.add_argument('--port', type=int, default=8000)
-    parser.add_argument('--domain', required=True)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--domain', help='proxy `/api` to this deployed site')
+    target.add_argument('--offline', action='store_true', help='run both Lambdas in-process against fakes')
+    parser.add_argument('--seed-days', type=int, default=90, help='(offline) days of scores to seed')
+    parser.add_argument('--seed-players', type=int, default=8, help='(offline) players to seed')
+    parser.add_argument('--quiet', action='store_true', help='(offline) do not log each request')
     args = parser.parse_args()
     run(args)
 